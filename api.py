@@ -0,0 +1,281 @@
+"""Local JSON HTTP API that runs next to the dashboard and shares its store.
+
+    python api.py [--host 127.0.0.1] [--port 8765]
+
+Routes (all accept ?user=<profile>, as in the dashboard URL):
+
+    GET    /sessions?start=YYYY-MM-DD&end=YYYY-MM-DD
+    GET    /sessions/active
+    POST   /sessions/start              {"parent", "child"}
+    POST   /sessions/stop
+    POST   /sessions                    {"parent", "child", "minutes", "at"}
+    GET    /subjects
+    POST   /subjects                    {"name", "target_hours", "parent"}
+    PATCH  /subjects/<parent>[/<task>...] {"name", "target_hours"}
+    DELETE /subjects/<parent>[/<task>...]
+    GET    /aggregates?period=Week&anchor=YYYY-MM-DD
+
+Nested tasks are addressed by path: "child" and "parent" in bodies accept
+"Task/Subtask", and the PATCH/DELETE URLs take one segment per level.
+
+GET bodies come from the rollup through datacache and carry an ETag built
+from the data/config file signatures, so a poller sending If-None-Match gets
+a 304 without anything being read or serialized.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import datacache
+from journal import AppendJournal, journal_path
+from periods import PERIODS, compare_periods
+from storage import open_store
+from subjects import subject_codes, subject_name_map
+from tracker import (
+    ConflictError, TrackerError, add_subject, data_paths, delete_subject, load_config, log_session,
+    read_active, save_config, start_session, stop_session, update_subject,
+)
+
+# data file -> store
+_stores = {}
+
+
+def _store(data_file):
+    if data_file not in _stores:
+        store = open_store(data_file)
+        store.init()
+        _stores[data_file] = store
+    return _stores[data_file]
+
+
+def _compact(data_file):
+    """Fold sessions journaled by the CLI or the dashboard into the store before reading."""
+    if AppendJournal(journal_path(data_file), _store(data_file)).compact():
+        datacache.touch(data_file)
+
+
+def _day(value, default):
+    return date.fromisoformat(value) if value else default
+
+
+# ---------- GET bodies (cached until the files change) ----------
+
+def _coded_store(data_file, config):
+    store = _store(data_file)
+    store.set_subject_codes(subject_codes(config))
+    return store
+
+
+def _sessions(data_file, config_file, start, end):
+    config = load_config(config_file)
+    names = subject_name_map(config)
+    frame = _coded_store(data_file, config).query(start, end)
+    return [
+        {
+            "timestamp": ts.isoformat(),
+            "utc_offset": int(offset),
+            "parent": names.get(parent, parent),
+            "child": names.get(child, child),
+            "duration_minutes": float(minutes),
+            "focus_score": int(score) if score == score else None,
+        }
+        for ts, offset, parent, child, minutes, score in zip(
+            frame["timestamp"], frame["utc_offset"], frame["parent_subject"], frame["child_subject"],
+            frame["duration_minutes"], frame["focus_score"],
+        )
+    ]
+
+
+def _subject_nodes(nodes):
+    return [
+        {
+            "name": name,
+            "id": node["id"],
+            "target_hours": node.get("target_hours"),
+            "children": _subject_nodes(node.get("children", {})),
+        }
+        for name, node in nodes.items()
+    ]
+
+
+def _subject_tree(config_file):
+    return _subject_nodes(load_config(config_file)["subjects"])
+
+
+def _summary(summary, roll, names):
+    by_parent = roll.groupby("parent_subject", observed=True)["duration_minutes"].sum().sort_values(ascending=False)
+    return {
+        "hours": round(summary["hours"], 2),
+        "sessions": summary["sessions"],
+        "avg_focus": round(summary["avg_focus"], 2),
+        "daily_hours": round(summary["daily_hours"], 2),
+        "by_subject": {names.get(k, k): round(float(v) / 60, 2) for k, v in by_parent.items()},
+    }
+
+
+def _aggregates(data_file, config_file, period, anchor):
+    config = load_config(config_file)
+    names = subject_name_map(config)
+    comparison = compare_periods(_coded_store(data_file, config), period, anchor)
+    start, end = comparison["window"]
+    top = comparison["current"]["top_subject"]
+    return {
+        "period": period,
+        "start": start.date().isoformat(),
+        "end": (end - timedelta(days=1)).date().isoformat(),
+        "current": _summary(comparison["current"], comparison["current_roll"], names),
+        "previous": _summary(comparison["previous"], comparison["previous_roll"], names),
+        "growth_pct": round(comparison["growth_pct"], 1),
+        "top_subject": names.get(top, top) if top else None,
+    }
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "FocusAPI/1.0"
+
+    # ---- plumbing ----
+    def _route(self):
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        data_file, config_file = data_paths(query.get("user", ""))
+        return parts, query, data_file, config_file
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        payload = json.loads(self.rfile.read(length))
+        if not isinstance(payload, dict):
+            raise TrackerError("request body must be a JSON object")
+        return payload
+
+    def _send(self, status, payload=None, etag=None):
+        body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        if payload is not None:
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, handler):
+        try:
+            handler()
+        except ConflictError as exc:
+            self._send(409, {"error": str(exc)})
+        except (TrackerError, ValueError, KeyError) as exc:
+            self._send(400, {"error": str(exc)})
+
+    # ---- GET ----
+    def do_GET(self):
+        self._dispatch(self._get)
+
+    def _get(self):
+        parts, query, data_file, config_file = self._route()
+        if parts == ["sessions", "active"]:
+            compute, paths = (lambda: read_active(data_file)), [data_file + ".active"]
+        elif parts == ["sessions"]:
+            start = _day(query.get("start"), None)
+            end = _day(query.get("end"), None)
+            compute, paths = (lambda: _sessions(data_file, config_file, start, end)), [data_file, config_file]
+        elif parts == ["subjects"]:
+            compute, paths = (lambda: _subject_tree(config_file)), [config_file]
+        elif parts == ["aggregates"]:
+            period = query.get("period", "Week")
+            if period not in PERIODS:
+                raise TrackerError(f"period must be one of {', '.join(PERIODS)}")
+            anchor = _day(query.get("anchor"), date.today())
+            compute, paths = (lambda: _aggregates(data_file, config_file, period, anchor)), [data_file, config_file]
+            parts = parts + [period, anchor.isoformat()]
+        else:
+            return self._send(404, {"error": f"no route GET {self.path}"})
+
+        if data_file in paths:
+            _compact(data_file)
+        signature = tuple(datacache.file_signature(p) for p in paths)
+        etag = '"%s"' % hashlib.sha1(repr((self.path, parts, signature)).encode()).hexdigest()[:20]
+        if self.headers.get("If-None-Match") == etag:
+            return self._send(304, etag=etag)
+        key = ("api", tuple(parts), tuple(sorted(query.items())), data_file, config_file)
+        self._send(200, datacache.cached(key, paths, compute), etag=etag)
+
+    # ---- writes ----
+    def do_POST(self):
+        self._dispatch(self._post)
+
+    def _post(self):
+        parts, query, data_file, config_file = self._route()
+        body = self._body()
+        if parts == ["sessions", "start"]:
+            return self._send(201, start_session(data_file, config_file, body.get("parent"), body.get("child")))
+        if parts == ["sessions", "stop"]:
+            return self._send(201, _record_json(stop_session(data_file, config_file, _store(data_file))))
+        if parts == ["sessions"]:
+            at = datetime.fromisoformat(body["at"]) if body.get("at") else None
+            record = log_session(data_file, config_file, body.get("parent"), body.get("child"),
+                                 float(body["minutes"]), at, _store(data_file))
+            return self._send(201, _record_json(record))
+        if parts == ["subjects"]:
+            return self._edit_subjects(config_file, 201, add_subject, body.get("name"),
+                                       body.get("target_hours", 10.0 if body.get("parent") else 50.0),
+                                       body.get("parent"))
+        self._send(404, {"error": f"no route POST {self.path}"})
+
+    def do_PATCH(self):
+        self._dispatch(self._patch)
+
+    def _patch(self):
+        parts, query, data_file, config_file = self._route()
+        if parts[:1] != ["subjects"] or len(parts) < 2:
+            return self._send(404, {"error": f"no route PATCH {self.path}"})
+        body = self._body()
+        parent, child = parts[1], tuple(parts[2:]) or None
+        self._edit_subjects(config_file, 200, update_subject, parent, child,
+                            name=body.get("name"), target_hours=body.get("target_hours"))
+
+    def do_DELETE(self):
+        self._dispatch(self._delete)
+
+    def _delete(self):
+        parts, query, data_file, config_file = self._route()
+        if parts[:1] != ["subjects"] or len(parts) < 2:
+            return self._send(404, {"error": f"no route DELETE {self.path}"})
+        parent, child = parts[1], tuple(parts[2:]) or None
+        self._edit_subjects(config_file, 200, delete_subject, parent, child)
+
+    def _edit_subjects(self, config_file, status, operation, *args, **kwargs):
+        config = load_config(config_file)
+        operation(config, *args, **kwargs)
+        save_config(config_file, config)
+        self._send(status, _subject_tree(config_file))
+
+
+def _record_json(record):
+    return {**record, "timestamp": record["timestamp"].isoformat()}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="api.py", description="Focus tracker local JSON API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FOCUS_API_PORT", 8765)))
+    args = parser.parse_args(argv)
+    server = ThreadingHTTPServer((args.host, args.port), ApiHandler)
+    print(f"Focus API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,26 @@ import altair as alt
 from datetime import datetime, date, timedelta
 import os
 
+from storage import open_store, import_csv
+from journal import AppendJournal, journal_path
+
 # ========= 全局配置 =========
 THEME_COLOR = "#008080"  # 深青色主题
 
-CSV_PATH = "learning_log.csv"
+DB_PATH = "learning_log.db"
+LEGACY_CSV_PATH = "learning_log.csv"
+LOG_COLUMNS = ["date", "subject", "start_time", "end_time", "duration_min", "focus_score"]
 DEFAULT_SUBJECTS = ["Python", "SQL", "Tableau", "统计学"]
 
+store = open_store(
+    DB_PATH,
+    columns=LOG_COLUMNS,
+    time_column="date",
+    index_columns=("subject",),
+    value_column="duration_min",
+)
+journal = AppendJournal(journal_path(DB_PATH), store)
+
 st.set_page_config(page_title="学习时长追踪", layout="wide")
 
 
@@ -27,32 +41,20 @@ def init_session_state():
         st.session_state.pomodoro_notifications = 0
 
 
-def load_data():
-    if not os.path.exists(CSV_PATH):
-        return pd.DataFrame(
-            columns=[
-                "date",
-                "subject",
-                "start_time",
-                "end_time",
-                "duration_min",
-                "focus_score",
-            ]
-        )
-    df = pd.read_csv(CSV_PATH)
-    if not df.empty:
-        # 保证类型正确
-        df["date"] = pd.to_datetime(df["date"]).dt.date
-        df["duration_min"] = pd.to_numeric(df["duration_min"], errors="coerce").fillna(0)
-        df["focus_score"] = pd.to_numeric(df["focus_score"], errors="coerce").fillna(0)
-    return df
+def init_store():
+    is_new_store = not os.path.exists(DB_PATH)
+    store.init()
+    # 一次性迁移旧版 CSV 记录
+    if is_new_store and os.path.exists(LEGACY_CSV_PATH):
+        import_csv(LEGACY_CSV_PATH, store)
+    # 恢复并合并崩溃前未落库的记录
+    journal.recover()
+    journal.compact()
 
 
 def append_record(record: dict):
     # record: {date, subject, start_time, end_time, duration_min, focus_score}
-    df_new = pd.DataFrame([record])
-    header = not os.path.exists(CSV_PATH)
-    df_new.to_csv(CSV_PATH, mode="a", index=False, header=header)
+    journal.append(record)
 
 
 def format_time(dt: datetime | None):
@@ -105,6 +107,55 @@ def inject_css():
 
 
 # ========= 计时 & 番茄钟逻辑 =========
+def elapsed_minutes_now():
+    if st.session_state.is_running and st.session_state.start_time is not None:
+        return (datetime.now() - st.session_state.start_time).total_seconds() / 60
+    return None
+
+
+def render_elapsed():
+    elapsed_text = "--:--:--"
+    elapsed_minutes = elapsed_minutes_now()
+    if elapsed_minutes is not None:
+        total_seconds = int(elapsed_minutes * 60)
+        h = total_seconds // 3600
+        m = (total_seconds % 3600) // 60
+        s = total_seconds % 60
+        elapsed_text = f"{h:02d}:{m:02d}:{s:02d}"
+    st.markdown("**本次已学习**")
+    st.markdown(f"<h2 style='margin-top:0;'>{elapsed_text}</h2>", unsafe_allow_html=True)
+
+
+def render_pomodoro():
+    elapsed_minutes = elapsed_minutes_now()
+    # 番茄钟提醒（仅在计时中）
+    if elapsed_minutes is not None:
+        current_pomodoro = int(elapsed_minutes // 25)
+        if current_pomodoro > st.session_state.pomodoro_notifications:
+            st.warning("已专注 25 分钟，休息 5 分钟。")
+            st.session_state.pomodoro_notifications = current_pomodoro
+
+        # Pomodoro 进度条（25 分钟一轮）
+        progress_pct = max(0, min(100, int((elapsed_minutes % 25) / 25 * 100)))
+    else:
+        progress_pct = 0
+
+    st.markdown("**当前番茄进度（25 分钟）**")
+    st.markdown(
+        f"""
+        <div style="width:100%;height:10px;background-color:#e0e0e0;border-radius:999px;overflow:hidden;">
+            <div style="height:100%;width:{progress_pct}%;background-color:{THEME_COLOR};"></div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+
+
+# 计时中只重跑这两个片段（每秒一次），不再整页重跑、重新加载数据和图表
+live_elapsed = st.fragment(run_every=1)(render_elapsed)
+live_pomodoro = st.fragment(run_every=1)(render_pomodoro)
+
+
 def handle_timer(subject_selected):
     init_session_state()
     now = datetime.now()
@@ -123,16 +174,10 @@ def handle_timer(subject_selected):
         )
 
     with col_mid:
-        elapsed_text = "--:--:--"
-        if st.session_state.is_running and st.session_state.start_time is not None:
-            elapsed = now - st.session_state.start_time
-            total_seconds = int(elapsed.total_seconds())
-            h = total_seconds // 3600
-            m = (total_seconds % 3600) // 60
-            s = total_seconds % 60
-            elapsed_text = f"{h:02d}:{m:02d}:{s:02d}"
-        st.markdown("**本次已学习**")
-        st.markdown(f"<h2 style='margin-top:0;'>{elapsed_text}</h2>", unsafe_allow_html=True)
+        if st.session_state.is_running:
+            live_elapsed()
+        else:
+            render_elapsed()
 
     with col_right:
         if st.session_state.is_running:
@@ -146,7 +191,7 @@ def handle_timer(subject_selected):
         st.session_state.start_time = now
         st.session_state.pomodoro_notifications = 0
         st.session_state.pending_record = None
-        st.experimental_rerun()
+        st.rerun()
 
     # 停止计时，生成待保存记录
     if btn and st.session_state.is_running:
@@ -166,35 +211,12 @@ def handle_timer(subject_selected):
 
         st.session_state.is_running = False
         st.session_state.start_time = None
-        st.experimental_rerun()
-
-    # 番茄钟提醒（仅在计时中）
-    if st.session_state.is_running and st.session_state.start_time is not None:
-        elapsed_minutes = (now - st.session_state.start_time).total_seconds() / 60
-        current_pomodoro = int(elapsed_minutes // 25)
-        if current_pomodoro > st.session_state.pomodoro_notifications:
-            st.warning("已专注 25 分钟，休息 5 分钟。")
-            st.session_state.pomodoro_notifications = current_pomodoro
-
-        # Pomodoro 进度条（25 分钟一轮）
-        progress_pct = max(0, min(100, int((elapsed_minutes % 25) / 25 * 100)))
-    else:
-        elapsed_minutes = 0
-        progress_pct = 0
+        st.rerun()
 
-    st.markdown("**当前番茄进度（25 分钟）**")
-    st.markdown(
-        f"""
-        <div style="width:100%;height:10px;background-color:#e0e0e0;border-radius:999px;overflow:hidden;">
-            <div style="height:100%;width:{progress_pct}%;background-color:{THEME_COLOR};"></div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
-
-    # 倒计时自动刷新（用于更新时间和番茄进度）
     if st.session_state.is_running:
-        st.experimental_rerun()
+        live_pomodoro()
+    else:
+        render_pomodoro()
 
 
 # ========= 评分 & 保存区域 =========
@@ -225,29 +247,27 @@ def rating_and_save_ui():
             append_record(rec_to_save)
             st.session_state.pending_record = None
             st.success("已保存。")
-            st.experimental_rerun()
+            st.rerun()
     with col2:
         st.caption("（若不想保存，可刷新页面清空该记录。）")
 
 
 # ========= 可视化看板 =========
-def dashboard(df: pd.DataFrame):
+def dashboard():
     st.markdown("---")
     st.markdown("## 学习统计看板")
 
-    if df.empty:
+    if store.totals(by=())["sessions"].iloc[0] == 0:
         st.info("暂无数据，先开始一次学习吧。")
         return
 
-    # 统一日期类型
-    df["date"] = pd.to_datetime(df["date"]).dt.date
-
-    # ---- 指标卡 ----
+    # ---- 指标卡（索引区间查询）----
     today = date.today()
     monday, sunday = get_current_week_range()
 
-    today_total = df[df["date"] == today]["duration_min"].sum()
-    week_df = df[(df["date"] >= monday) & (df["date"] <= sunday)]
+    today_total = store.totals(today, today + timedelta(days=1), by=())["duration_min"].iloc[0]
+    week_df = store.query(monday, sunday + timedelta(days=1))
+    week_df["focus_score"] = pd.to_numeric(week_df["focus_score"], errors="coerce")
     week_max_focus = week_df["focus_score"].max() if not week_df.empty else 0
 
     col1, col2 = st.columns(2)
@@ -264,9 +284,7 @@ def dashboard(df: pd.DataFrame):
 
     # ---- 柱状图：按天总时长 ----
     st.markdown("### 按天学习时长")
-    df_daily = (
-        df.groupby("date", as_index=False)["duration_min"].sum().sort_values("date")
-    )
+    df_daily = store.daily_totals().rename_axis("date").reset_index().sort_values("date")
     chart_daily = (
         alt.Chart(df_daily)
         .mark_bar(color=THEME_COLOR)
@@ -281,11 +299,7 @@ def dashboard(df: pd.DataFrame):
 
     # ---- 饼图：学科占比 ----
     st.markdown("### 各学科学习时长占比")
-    df_subject = (
-        df.groupby("subject", as_index=False)["duration_min"].sum().sort_values(
-            "duration_min", ascending=False
-        )
-    )
+    df_subject = store.totals(by=["subject"]).sort_values("duration_min", ascending=False)
     if not df_subject.empty:
         chart_pie = (
             alt.Chart(df_subject)
@@ -304,22 +318,20 @@ def dashboard(df: pd.DataFrame):
     # ---- 热力图：近一年 GitHub 风格 ----
     st.markdown("### 过去一年的学习热力图")
 
-    df_heat = df.copy()
-    df_heat["date"] = pd.to_datetime(df_heat["date"])
-    one_year_ago = pd.to_datetime(today) - timedelta(days=365)
-    df_heat = df_heat[df_heat["date"] >= one_year_ago]
-
-    if df_heat.empty:
-        st.write("近一年暂无数据。")
-        return
+    one_year_ago = today - timedelta(days=365)
 
     # 以天聚合
     df_heat = (
-        df_heat.groupby("date", as_index=False)["duration_min"].sum().rename(
-            columns={"duration_min": "total_min"}
-        )
+        store.daily_totals(one_year_ago)
+        .rename_axis("date")
+        .reset_index()
+        .rename(columns={"duration_min": "total_min"})
     )
 
+    if df_heat.empty:
+        st.write("近一年暂无数据。")
+        return
+
     # Altair GitHub 风格：x=week(date), y=day(date)
     chart_heat = (
         alt.Chart(df_heat)
@@ -352,7 +364,7 @@ def main():
         unsafe_allow_html=True,
     )
 
-    df = load_data()
+    init_store()
 
     # 顶部：计时器区
     handle_timer(st.session_state.current_subject)
@@ -361,7 +373,7 @@ def main():
     rating_and_save_ui()
 
     # 底部：统计看板
-    dashboard(df)
+    dashboard()
 
 
 if __name__ == "__main__":
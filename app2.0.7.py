@@ -4,20 +4,46 @@ import json
 import os
 import time
 import colorsys
+import copy
+import hashlib
 from datetime import datetime, timedelta
-import plotly.express as px
-import plotly.graph_objects as go
-import streamlit.components.v1 as components
+from storage import open_store, import_csv
+from journal import AppendJournal, journal_path
+import datacache
+from periods import build_day_index, compare_periods, compare_ranges, custom_windows, period_window, previous_window
+from profiler import RerunProfiler, profiling_requested
+from heatmap import ROLLING_WINDOW, heatmap_grid
+from charts import gauge_figure, pie_figure, heatmap_figure
+from profiles import DEFAULT_PROFILE, LEADERBOARD_SIZE, profile_slug, profile_paths, leaderboard
+from scoring import get_focus_score
+from subjects import (
+    ensure_subject_ids, subject_ids, archive_subject, legacy_name_maps, subject_totals, build_subject_index,
+    find_node, sibling_map, task_path, task_label, layout_minutes, subtree_total, node_breakdown,
+)
 
 # ==========================================
 # 1. System Initialization & Data Foundation
 # ==========================================
 st.set_page_config(page_title="Focus", layout="wide", initial_sidebar_state="expanded")
 
-DATA_FILE = "learning_logs.csv"
-CONFIG_FILE = "subjects.json"
+# 可选性能剖析: ?profile=1 或 FOCUS_PROFILE=1
+profiler = RerunProfiler(profiling_requested(st.query_params))
+profiler.section("initialization")
+
+# 后端由扩展名决定: .db (SQLite, 默认) / .parquet (按年月分区的列式归档) / .csv
+DATA_NAME = os.environ.get("FOCUS_DATA_FILE", "learning_logs.db")
+LEGACY_CSV_FILE = "learning_logs.csv"
+
+# 用户档案: ?user=<name> 或侧边栏登录; 每个用户有独立的日志与科目树
+PROFILE = profile_slug(st.query_params.get("user", DEFAULT_PROFILE))
+DATA_FILE, CONFIG_FILE = profile_paths(PROFILE, DATA_NAME, "subjects.json")
+
+store = open_store(DATA_FILE)
+# 结束会话先写入带校验的追加日志, 再批量合并进主存储
+journal = AppendJournal(journal_path(DATA_FILE), store)
 
 def init_system():
+    os.makedirs(os.path.dirname(CONFIG_FILE) or ".", exist_ok=True)
     if not os.path.exists(CONFIG_FILE):
         default_config = {
             "theme_color": "#007AFF",
@@ -38,22 +64,49 @@ def init_system():
         with open(CONFIG_FILE, "w", encoding="utf-8") as f:
             json.dump(default_config, f, ensure_ascii=False, indent=4)
             
-    if not os.path.exists(DATA_FILE):
-        df = pd.DataFrame(columns=["timestamp", "parent_subject", "child_subject", "duration_minutes", "focus_score"])
-        df.to_csv(DATA_FILE, index=False, encoding="utf-8")
+    is_new_store = not os.path.exists(DATA_FILE)
+    # 建表幂等; 缺少日汇总表时会从原始日志重建
+    store.init()
+    # 一次性迁移: 旧版 CSV 日志导入默认档案
+    if is_new_store and PROFILE == DEFAULT_PROFILE and os.path.exists(LEGACY_CSV_FILE) and LEGACY_CSV_FILE != DATA_FILE:
+        import_csv(LEGACY_CSV_FILE, store)
+    # 崩溃恢复: 截掉写了一半的尾行, 再把未合并的记录并入主存储
+    journal.recover()
+    if journal.compact():
+        datacache.touch(DATA_FILE)
 
 init_system()
 
-def load_config():
+def _read_config():
     with open(CONFIG_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def load_config():
+    """进程内所有会话共享同一份解析结果 (只读); 修改须在 edit_config() 的副本上进行, 再 save_config 落盘"""
+    return datacache.cached(("config", CONFIG_FILE), [CONFIG_FILE], _read_config)
+
+def edit_config():
+    """可修改的配置副本: 共享字典可能正被其他会话的线程遍历, 原地 pop/插入会打断它们"""
+    return copy.deepcopy(config)
+
 def save_config(new_config):
+    ensure_subject_ids(new_config)
     with open(CONFIG_FILE, "w", encoding="utf-8") as f:
         json.dump(new_config, f, ensure_ascii=False, indent=4)
+    datacache.touch(CONFIG_FILE)
 
 config = load_config()
 
+# 稳定科目 ID: 日志只存 ID, 改名只需修改 subjects.json
+migrated = edit_config()
+if ensure_subject_ids(migrated) or not migrated.get("log_subject_ids"):
+    if not migrated.get("log_subject_ids"):
+        store.relabel_subjects(*legacy_name_maps(migrated))
+        datacache.touch(DATA_FILE)
+        migrated["log_subject_ids"] = True
+    save_config(migrated)
+    config = migrated
+
 # --- Robust Helper Functions ---
 def sanitize_hex(color_str):
     if not color_str: return "#000000"
@@ -71,37 +124,53 @@ def adjust_color(hex_color, lightness_factor, alpha=1.0):
         return f"rgba({int(nr*255)}, {int(ng*255)}, {int(nb*255)}, {alpha})"
     return f"#{int(nr*255):02x}{int(ng*255):02x}{int(nb*255):02x}"
 
-def get_parent_target(parent_name):
-    parent_data = config["subjects"].get(parent_name, {})
-    children = parent_data.get("children", {})
-    if not children:
-        return max(0.1, parent_data.get("target_hours", 1.0))
-    return max(0.1, sum(child_data.get("target_hours", 1.0) for child_data in children.values()))
-
-def get_focus_score(minutes):
-    if minutes < 5: return 1
-    elif minutes <= 15: return 2
-    elif minutes <= 30: return 3
-    elif minutes <= 45: return 4
-    else: return 5
-
-def update_csv_history(col_name, old_val, new_val):
-    df_temp = pd.read_csv(DATA_FILE)
-    if not df_temp.empty:
-        df_temp.loc[df_temp[col_name] == old_val, col_name] = new_val
-        df_temp.to_csv(DATA_FILE, index=False, encoding="utf-8")
+def load_day_index(start=None, end=None):
+    """按日 (及按科目/任务) 的前缀和索引, 覆盖 [start, end) (默认全部历史); 之后区间内任意日期范围都是两次查表
+    只在构建时计入扫描行数, 缓存命中为 0"""
+    def build():
+        index = build_day_index(store, start, end)
+        profiler.rows(index["rows"])
+        return index
+    return datacache.cached(("day_index", DATA_FILE, start, end), [DATA_FILE], build)
+
+def period_comparison(period, anchor):
+    """当前/上一周期汇总, 按 (粒度, 锚定日) 跨会话缓存; KPI、仪表盘和报告共用
+    SQLite 的汇总表是持久化的, 全历史索引只读 日 x 科目 行; 文件型存储要重新分组全部原始记录
+    (Parquet 还会打开所有年份), 所以仍只读当前与上一周期两个窗口"""
+    if store.persisted_rollup:
+        window = period_window(period, anchor)
+        compute = lambda: compare_ranges(load_day_index(), window, previous_window(period, window[0]), anchor, period)
+    else:
+        def compute():
+            comparison = compare_periods(store, period, anchor)
+            profiler.rows(len(comparison["current_roll"]) + len(comparison["previous_roll"]))
+            return comparison
+    return datacache.cached(("period", DATA_FILE, period, anchor.date()), [DATA_FILE], compute)
+
+def range_comparison(first_day, last_day, anchor):
+    """自定义日期区间 (含首尾两天) 与紧邻的前一段等长区间对比, 只查前缀和
+    文件型存储的索引只覆盖这两段区间, 不扫描更早的历史"""
+    window, previous = custom_windows(first_day, last_day)
+    index = load_day_index() if store.persisted_rollup else load_day_index(previous[0], window[1])
+    return compare_ranges(index, window, previous, anchor)
+
+def pick_date_range(key, anchor):
+    """日期区间选择器, 默认最近 30 天; 只选了起点时按单日处理"""
+    picked = st.date_input("Date range", value=(anchor.date() - timedelta(days=29), anchor.date()),
+                           key=key, label_visibility="collapsed")
+    if not isinstance(picked, (tuple, list)):
+        picked = (picked,)
+    return (picked[0], picked[-1]) if picked else (anchor.date(), anchor.date())
 
 # ==========================================
 # 2. Deep Liquid Glass CSS Engine & 4-Color Animation
 # ==========================================
+profiler.section("css")
+STYLESHEET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "focus.css")
+
 raw_theme_color = config.get("theme_color", "#007AFF")
 safe_theme_color = sanitize_hex(raw_theme_color)
 
-# Generate 4-color palette for the liquid background
-theme_dark = adjust_color(safe_theme_color, 0.6)
-theme_light_gray = "#E2EBF0"
-theme_alpha = adjust_color(safe_theme_color, 1.0, 0.25)
-
 def generate_monochromatic_palette(base_hex, n=5):
     base_hex = base_hex.lstrip('#')[:6]
     r, g, b = tuple(int(base_hex[i:i+2], 16)/255.0 for i in (0, 2, 4))
@@ -114,200 +183,45 @@ def generate_monochromatic_palette(base_hex, n=5):
         palette.append(f"#{int(nr*255):02x}{int(ng*255):02x}{int(nb*255):02x}")
     return palette
 
-palette = generate_monochromatic_palette(safe_theme_color, max(len(config["subjects"]), 5))
-
-st.markdown(f"""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&family=Outfit:wght@300;400;500;700&display=swap');
-
-    :root {{
-        --theme-color: {safe_theme_color};
-        --theme-dark: {theme_dark};
-        --theme-light-gray: {theme_light_gray};
-        --theme-alpha: {theme_alpha};
-        --text-main: #1D1D1F;
-        --text-muted: #5A5A5E;
-        --glass-bg: rgba(255, 255, 255, 0.4);
-        --glass-border: rgba(255, 255, 255, 0.3);
-        --glass-shadow: 0 8px 32px 0 rgba(31, 38, 135, 0.07);
-    }}
-    
-    #MainMenu, header, footer {{visibility: hidden;}}
-    
-    /* 突破 1: 四色动态液态背景 (15秒周期呼吸感) */
-    @keyframes liquid-bg {{
-        0% {{ background-position: 0% 50%; }}
-        50% {{ background-position: 100% 50%; }}
-        100% {{ background-position: 0% 50%; }}
-    }}
-    .stApp, div.main {{
-        background: linear-gradient(-45deg, var(--theme-color), var(--theme-dark), var(--theme-light-gray), var(--theme-alpha)) !important;
-        background-size: 400% 400% !important;
-        animation: liquid-bg 15s ease infinite !important;
-        background-attachment: fixed !important;
-        font-family: 'Inter', sans-serif;
-        color: var(--text-main);
-    }}
-
-    /* THE WHITE BAR KILLER */
-    .st-emotion-cache-1wivap2, .st-emotion-cache-1104q3y, .st-emotion-cache-16txtl3, 
-    .st-emotion-cache-1y4p8pa, .st-emotion-cache-1n76uvr, .st-emotion-cache-18ni7ap,
-    .st-emotion-cache-1jicfl2, .st-emotion-cache-1dp5vir, .st-emotion-cache-1v0mbdj,[data-testid="stVerticalBlock"],[data-testid="stHorizontalBlock"],[data-testid="stVerticalBlockBorderWrapper"],[data-testid="stHeader"],[data-testid="stMarkdownContainer"], .element-container, .stMain,[data-testid="stMetric"], .stPlotlyChart, .stMarkdown {{
-        background: transparent !important;
-        background-color: transparent !important;
-        border: none !important;
-    }}
-    
-    /* 突破 2: L1 绝对平衡与对齐 (垂直居中) */[data-testid="stHorizontalBlock"] {{
-        align-items: center !important;
-    }}
-    
-    /* Universal Glass Card */
-    .glass-card {{
-        background: var(--glass-bg) !important;
-        backdrop-filter: blur(30px) !important;
-        -webkit-backdrop-filter: blur(30px) !important;
-        border: 1px solid var(--glass-border) !important;
-        border-radius: 28px !important;
-        padding: 32px !important;
-        box-shadow: var(--glass-shadow) !important;
-        margin-bottom: 24px !important;
-        transition: all 0.3s cubic-bezier(0.25, 0.8, 0.25, 1);
-    }}
-
-    /* Grid Gallery & Immersive Cards */
-    .gallery-grid {{
-        display: grid;
-        grid-template-columns: repeat(2, 1fr);
-        gap: 20px;
-        align-items: start;
-    }}
-    
-    details.glass-card-detail {{
-        background: var(--glass-bg);
-        backdrop-filter: blur(30px);
-        -webkit-backdrop-filter: blur(30px);
-        border: 1px solid var(--glass-border);
-        border-radius: 28px;
-        padding: 24px;
-        box-shadow: var(--glass-shadow);
-        color: var(--text-main);
-        transition: transform 0.3s cubic-bezier(0.34, 1.56, 0.64, 1), box-shadow 0.3s ease, background 0.3s ease;
-    }}
-    details.glass-card-detail[open] {{ background: rgba(255,255,255,0.6); }}
-    
-    details.active-glass-card-detail {{
-        background: var(--theme-color) !important;
-        backdrop-filter: blur(30px);
-        border: 1px solid rgba(255,255,255,0.5);
-        border-radius: 28px;
-        padding: 24px;
-        box-shadow: 0 12px 40px {safe_theme_color}66;
-        color: #FFFFFF !important;
-        transition: transform 0.3s cubic-bezier(0.34, 1.56, 0.64, 1), box-shadow 0.3s ease, background 0.3s ease;
-    }}
-    
-    /* 突破 3: 悬停缩放与光晕增强 */
-    details.glass-card-detail:hover, details.active-glass-card-detail:hover {{
-        transform: scale(1.02);
-        box-shadow: 0 20px 40px rgba(0,0,0,0.15), 0 0 20px var(--theme-alpha);
-    }}
-
-    details.glass-card-detail > summary, details.active-glass-card-detail > summary {{ list-style: none; outline: none; cursor: pointer; }}
-    details.glass-card-detail > summary::-webkit-details-marker, details.active-glass-card-detail > summary::-webkit-details-marker {{ display: none; }}
-    
-    details.active-glass-card-detail .pg-label, details.active-glass-card-detail span {{ color: rgba(255,255,255,0.9) !important; }}
-    details.active-glass-card-detail .pg-fill {{ background-color: #FFFFFF !important; }}
-    details.active-glass-card-detail .pg-track {{ background: rgba(0,0,0,0.2) !important; }}
-    details.active-glass-card-detail .task-list-container {{ border-top: 1px solid rgba(255,255,255,0.3) !important; }}
-
-    /* KPI Typography */
-    .kpi-container {{ display: flex; flex-direction: column; justify-content: center; height: 130px; text-align: center; }}
-    .kpi-title {{ color: var(--text-muted); font-size: 0.9rem; font-weight: 600; text-transform: uppercase; letter-spacing: 1.5px; margin-bottom: 8px; }}
-    .kpi-value {{ color: var(--theme-color); font-family: 'Outfit', sans-serif; font-size: 3.5rem; font-weight: 700; line-height: 1; letter-spacing: -1px; text-shadow: 0 4px 20px rgba(255,255,255,0.4); }}
-    .kpi-value span {{ font-size: 1.2rem; color: var(--text-muted); margin-left: 4px; font-weight: 500; letter-spacing: 0; text-shadow: none; }}
-
-    /* Buttons */
-    .stButton > button {{
-        background: rgba(255, 255, 255, 0.45) !important;
-        backdrop-filter: blur(25px) !important;
-        border: 1px solid var(--glass-border) !important;
-        border-radius: 24px !important;
-        color: var(--text-main) !important;
-        font-weight: 600 !important;
-        padding: 10px 24px !important;
-        box-shadow: var(--glass-shadow) !important;
-        transition: all 0.3s ease !important;
-    }}
-    .stButton > button:hover {{
-        background: var(--theme-color) !important;
-        color: #FFFFFF !important;
-        border-color: var(--theme-color) !important;
-        transform: scale(1.02);
-    }}
-    
-    /* Primary Buttons (Confirm/Save) */
-    .stButton > button[kind="primary"] {{
-        background: var(--theme-color) !important;
-        color: #FFFFFF !important;
-        border: none !important;
-        box-shadow: 0 4px 15px rgba(0,0,0,0.1) !important;
-    }}
-    .stButton > button[kind="primary"]:hover {{
-        filter: brightness(1.1);
-    }}
-
-    /* Sidebar Expander (Laboratory Card UI) */[data-testid="stSidebar"][data-testid="stExpander"] {{
-        background: rgba(255, 255, 255, 0.35) !important;
-        backdrop-filter: blur(30px) !important;
-        -webkit-backdrop-filter: blur(30px) !important;
-        border: 1px solid rgba(255, 255, 255, 0.4) !important;
-        border-radius: 28px !important;
-        box-shadow: var(--glass-shadow) !important;
-        margin-bottom: 16px !important;
-    }}[data-testid="stExpander"] details {{ border: none !important; background: transparent !important; }}[data-testid="stExpander"] summary {{
-        padding: 16px 28px !important;
-        border: none !important;
-        background: transparent !important;
-        font-family: 'Inter', sans-serif;
-        font-size: 1rem;
-        font-weight: 600;
-        color: var(--text-main);
-    }}
-    [data-testid="stExpander"] summary:hover {{ color: var(--theme-color); }}
-    [data-testid="stExpander"] div[role="region"] {{ background: transparent !important; padding: 0 28px 28px 28px !important; }}
-
-    /* 突破 2: L1 绝对平衡与对齐 (右对齐维度选择器) */[data-testid="stRadio"] {{ display: flex; justify-content: flex-end; width: 100%; }}
-    div[role="radiogroup"] {{ gap: 12px; }}
-    div[role="radio"][aria-checked="true"] > div:first-child > div {{ background-color: var(--theme-color) !important; }}
-    div[role="radio"][aria-checked="true"] > div:first-child {{ border-color: var(--theme-color) !important; }}
-    
-    /* Sidebar & Dialog */[data-testid="stSidebar"] {{
-        background: rgba(255, 255, 255, 0.25) !important;
-        backdrop-filter: blur(40px) !important;
-        border-right: 1px solid var(--glass-border) !important;
-    }}
-    div[data-testid="stDialog"] > div {{
-        background: rgba(255, 255, 255, 0.8) !important;
-        backdrop-filter: blur(50px) !important;
-        border: 1px solid var(--glass-border) !important;
-        border-radius: 30px !important;
-        box-shadow: 0 20px 60px rgba(0,0,0,0.1) !important;
-    }}
-    
-    /* Custom Progress */
-    .pg-track {{ width: 100%; height: 6px; background: rgba(255,255,255,0.4); border-radius: 3px; overflow: hidden; margin: 10px 0; }}
-    .pg-fill {{ height: 100%; border-radius: 3px; transition: width 1s ease; background-color: var(--theme-color); }}
-    .pg-label {{ display: flex; justify-content: space-between; font-size: 0.85rem; color: var(--text-muted); font-weight: 600; }}
-    
-    /* Typography */
-    .section-title {{ font-family: 'Outfit', sans-serif; font-size: 1.4rem; font-weight: 600; color: var(--text-main); margin-bottom: 20px; letter-spacing: -0.5px; }}
-</style>
-""", unsafe_allow_html=True)
+@st.cache_data(show_spinner=False)
+def build_theme(theme_color, subject_count):
+    """4-color liquid background variables + pie palette, memoized per (theme color, subject count)"""
+    theme_dark = adjust_color(theme_color, 0.6)
+    theme_light_gray = "#E2EBF0"
+    theme_alpha = adjust_color(theme_color, 1.0, 0.25)
+    theme_vars = f"""<style>:root {{ --theme-color: {theme_color}; --theme-dark: {theme_dark}; --theme-light-gray: {theme_light_gray}; --theme-alpha: {theme_alpha}; --theme-glow: {theme_color}66; }}</style>"""
+    return theme_vars, generate_monochromatic_palette(theme_color, max(subject_count, 5))
+
+@st.cache_data(show_spinner=False)
+def stylesheet_tag():
+    """Link to static/focus.css when static serving is on (browser-cached), else inline it once per rerun"""
+    with open(STYLESHEET_FILE, "rb") as f:
+        content = f.read()
+    if st.get_option("server.enableStaticServing"):
+        version = hashlib.md5(content).hexdigest()[:8]
+        return f'<link rel="stylesheet" href="app/static/focus.css?v={version}">'
+    return f"<style>{content.decode('utf-8')}</style>"
+
+theme_vars, palette = build_theme(safe_theme_color, len(config["subjects"]))
+
+def load_subject_index():
+    """科目树索引 (ID、目标合计、顺序、配色): 与配置同一缓存版本, 只在 save_config 写入后重建"""
+    return datacache.cached(("subject_index", CONFIG_FILE), [CONFIG_FILE],
+                            lambda: build_subject_index(config, tuple(palette)))
+
+subject_index = load_subject_index()
+subject_names = subject_index["names"]
+# 科目列按 subjects.json 的 ID 表编码为分类列, 分组/筛选比较整数编码而非字符串
+store.set_subject_codes(subject_index["codes"])
+
+# 静态样式表由浏览器缓存, 每次重跑只发送主题变量
+st.markdown(theme_vars, unsafe_allow_html=True)
+st.markdown(stylesheet_tag(), unsafe_allow_html=True)
 
 # ==========================================
 # 3. State Management & Shadow Proxy Pattern
 # ==========================================
+profiler.section("state")
 if 'timer_state' not in st.session_state: st.session_state.timer_state = 'idle'
 if 'start_time' not in st.session_state: st.session_state.start_time = None
 
@@ -319,50 +233,40 @@ def sync_p_name_callback():
     st.session_state.shadow_p_name = st.session_state.m_p_sel
 
 def sync_c_name_callback():
-    st.session_state.shadow_c_name = st.session_state.m_c_sel
+    # 任务以路径标签 "A / B" 显示, 改名框只填叶子名称
+    st.session_state.shadow_c_name = task_path(st.session_state.m_c_sel)[-1]
 
 def sync_p_c_name_callback():
     parent = st.session_state.m_c_p_sel
-    children = list(config["subjects"][parent]["children"].keys())
-    st.session_state.shadow_c_name = children[0] if children else ""
+    tasks = subject_index["tasks"][parent]
+    st.session_state.shadow_c_name = task_path(tasks[0])[-1] if tasks else ""
 
 # ==========================================
 # 4. Sidebar: Theme -> Report -> Laboratory
 # ==========================================
-df = pd.read_csv(DATA_FILE)
-df['timestamp'] = pd.to_datetime(df['timestamp'])
+profiler.section("sidebar")
 now = datetime.now()
 
 @st.dialog("Intelligence Report")
-def show_report_dialog(period_type):
-    if period_type == "Weekly":
-        curr_start = now - timedelta(days=now.weekday())
-        prev_start = curr_start - timedelta(weeks=1)
-        prev_end = curr_start
-        period_name = "Weekly"
-    elif period_type == "Monthly":
-        curr_start = now.replace(day=1)
-        prev_start = (curr_start - timedelta(days=1)).replace(day=1)
-        prev_end = curr_start
-        period_name = "Monthly"
+def show_report_dialog(period_type, date_range=None):
+    if period_type == "Custom":
+        first_day, last_day = date_range
+        period_name = f"{first_day:%b %d} – {last_day:%b %d, %Y}"
+        comparison = range_comparison(first_day, last_day, now)
     else:
-        curr_start = now.replace(month=1, day=1)
-        prev_start = curr_start.replace(year=curr_start.year - 1)
-        prev_end = curr_start
-        period_name = "Yearly"
-
-    curr_df = df[df['timestamp'] >= curr_start]
-    prev_df = df[(df['timestamp'] >= prev_start) & (df['timestamp'] < prev_end)]
-
-    c_hours = curr_df['duration_minutes'].sum() / 60 if not curr_df.empty else 0.0
-    p_hours = prev_df['duration_minutes'].sum() / 60 if not prev_df.empty else 0.0
+        period = {"Weekly": "Week", "Monthly": "Month"}.get(period_type, "Year")
+        period_name = period_type
+        # 与看板共用同一个周期比较结果
+        comparison = period_comparison(period, now)
+    current = comparison["current"]
+    c_hours = current["hours"]
     
-    growth = ((c_hours - p_hours) / p_hours) * 100 if p_hours > 0 else (100 if c_hours > 0 else 0)
+    growth = comparison["growth_pct"]
     growth_str = f"{growth:+.1f}%"
     growth_color = safe_theme_color if growth >= 0 else "#FF3B30"
 
-    top_subj = curr_df.groupby('parent_subject')['duration_minutes'].sum().idxmax() if not curr_df.empty else "None"
-    avg_focus = curr_df['focus_score'].mean() if not curr_df.empty else 0.0
+    top_subj = subject_names.get(current["top_subject"], current["top_subject"]) if current["top_subject"] else "None"
+    avg_focus = current["avg_focus"]
 
     st.markdown(f"""
     <div style="text-align: center; padding: 10px;">
@@ -388,19 +292,41 @@ def show_report_dialog(period_type):
 with st.sidebar:
     st.markdown("<h2 style='font-family: Outfit; font-weight: 600; margin-bottom: 24px;'>Settings</h2>", unsafe_allow_html=True)
     
+    login_name = st.text_input("Profile", value=PROFILE, help="Each profile has its own sessions and subjects")
+    if profile_slug(login_name) != PROFILE:
+        st.query_params["user"] = profile_slug(login_name)
+        st.rerun()
+
     new_color = st.color_picker("Theme Color", raw_theme_color)
     if new_color != raw_theme_color:
-        config["theme_color"] = new_color
-        save_config(config)
+        draft = edit_config()
+        draft["theme_color"] = new_color
+        save_config(draft)
         st.rerun()
         
     st.markdown("<div style='height: 20px'></div>", unsafe_allow_html=True)
     
     with st.container():
         st.markdown("<div style='font-size: 0.85rem; color: var(--text-muted); font-weight: 600; margin-bottom: 8px;'>Report Generator</div>", unsafe_allow_html=True)
-        report_period = st.selectbox("Period", ["Weekly", "Monthly", "Yearly"], label_visibility="collapsed")
+        report_period = st.selectbox("Period", ["Weekly", "Monthly", "Yearly", "Custom"], label_visibility="collapsed")
+        report_range = pick_date_range("report_range", now) if report_period == "Custom" else None
         if st.button("Generate Report", use_container_width=True):
-            show_report_dialog(report_period)
+            show_report_dialog(report_period, report_range)
+
+    with st.expander("Leaderboard", expanded=False):
+        board_period = st.radio("Leaderboard Period", ["Week", "Month", "Year"], horizontal=True, label_visibility="collapsed")
+        # 由各用户的日汇总得出, 不扫描任何原始会话
+        board = leaderboard(board_period, now, DATA_NAME)
+        if board:
+            rank = {user: i + 1 for i, (user, _, _) in enumerate(board)}
+            st.dataframe(
+                pd.DataFrame(board[:LEADERBOARD_SIZE], columns=["Profile", "Hours", "Sessions"]).round({"Hours": 1}),
+                hide_index=True, use_container_width=True,
+            )
+            if PROFILE in rank and rank[PROFILE] > LEADERBOARD_SIZE:
+                st.caption(f"You: #{rank[PROFILE]} of {len(board)}")
+        else:
+            st.caption("No sessions yet")
             
     st.markdown("<div style='height: 30px'></div>", unsafe_allow_html=True)
     st.markdown("<h2 style='font-family: Outfit; font-weight: 600; margin-bottom: 16px;'>Laboratory</h2>", unsafe_allow_html=True)
@@ -410,26 +336,31 @@ with st.sidebar:
         new_p_target = st.number_input("Target (Hours)", min_value=1.0, value=50.0, step=1.0, key="c_p_target")
         if st.button("Add Subject", type="primary", use_container_width=True) and new_parent:
             if new_parent not in config["subjects"]:
-                config["subjects"][new_parent] = {"target_hours": new_p_target, "children": {}}
-                save_config(config)
+                draft = edit_config()
+                draft["subjects"][new_parent] = {"target_hours": new_p_target, "children": {}}
+                save_config(draft)
                 st.rerun()
         
         st.markdown("<hr style='margin: 12px 0; opacity: 0.2;'>", unsafe_allow_html=True)
-        if config["subjects"]:
-            sel_p_for_c = st.selectbox("Parent", list(config["subjects"].keys()), key="c_c_parent")
+        if subject_index["parents"]:
+            # 任意节点都可以挂子任务, 树的深度不限
+            sel_node_for_c = st.selectbox("Parent", subject_index["order"], key="c_c_parent",
+                                          format_func=lambda nid: task_label(subject_index["paths"][nid]))
             new_child = st.text_input("Task Name", key="c_c_name", placeholder="Task Name")
             new_c_target = st.number_input("Target", min_value=1.0, value=10.0, step=1.0, key="c_c_target")
             if st.button("Add Task", type="primary", use_container_width=True) and new_child:
-                if new_child not in config["subjects"][sel_p_for_c]["children"]:
-                    config["subjects"][sel_p_for_c]["children"][new_child] = {"target_hours": new_c_target}
-                    save_config(config)
+                draft = edit_config()
+                siblings = find_node(draft, subject_index["paths"][sel_node_for_c]).setdefault("children", {})
+                if new_child not in siblings:
+                    siblings[new_child] = {"target_hours": new_c_target}
+                    save_config(draft)
                     st.rerun()
 
     with st.expander("Modify", expanded=False):
-        if config["subjects"]:
+        if subject_index["parents"]:
             mod_type = st.radio("Type",["Parent", "Child"], horizontal=True, label_visibility="collapsed")
             if mod_type == "Parent":
-                p_list = list(config["subjects"].keys())
+                p_list = list(subject_index["parents"])
                 # 绑定 on_change 回调更新影子变量
                 mod_p = st.selectbox("Select", p_list, key="m_p_sel", on_change=sync_p_name_callback)
                 
@@ -437,93 +368,94 @@ with st.sidebar:
                 # 突破 4: 严禁绑定 key，使用 value 接收影子状态，避免双向绑定冲突
                 new_rn_name = st.text_input("Rename", value=current_shadow_p)
                 
-                has_children = len(config["subjects"][mod_p]["children"]) > 0
+                has_children = len(subject_index["children"][mod_p]) > 0
                 new_rn_target = st.number_input("Target", min_value=1.0, value=float(config["subjects"][mod_p].get("target_hours", 50.0)), step=1.0, disabled=has_children)
                 
                 if st.button("Save", key="m_p_btn", type="primary", use_container_width=True):
+                    draft = edit_config()
                     if new_rn_name and new_rn_name != mod_p:
-                        config["subjects"][new_rn_name] = config["subjects"].pop(mod_p)
-                        update_csv_history("parent_subject", mod_p, new_rn_name)
+                        draft["subjects"][new_rn_name] = draft["subjects"].pop(mod_p)
                     target_name = new_rn_name if new_rn_name else mod_p
                     if not has_children:
-                        config["subjects"][target_name]["target_hours"] = new_rn_target
-                    save_config(config)
+                        draft["subjects"][target_name]["target_hours"] = new_rn_target
+                    save_config(draft)
                     st.session_state.shadow_p_name = ""
                     st.rerun()
             else:
-                p_list = list(config["subjects"].keys())
+                p_list = list(subject_index["parents"])
                 mod_p_c = st.selectbox("Select Parent", p_list, key="m_c_p_sel", on_change=sync_p_c_name_callback)
-                c_list = list(config["subjects"][mod_p_c]["children"].keys())
+                c_list = list(subject_index["tasks"][mod_p_c])
                 
                 if c_list:
                     mod_c = st.selectbox("Select Task", c_list, key="m_c_sel", on_change=sync_c_name_callback)
+                    c_path = (mod_p_c,) + task_path(mod_c)
+                    c_node = find_node(config, c_path)
                     
-                    current_shadow_c = st.session_state.shadow_c_name if st.session_state.shadow_c_name else mod_c
+                    current_shadow_c = st.session_state.shadow_c_name if st.session_state.shadow_c_name else c_path[-1]
                     # 突破 4: 严禁绑定 key，使用 value 接收影子状态
                     new_c_name = st.text_input("Rename", value=current_shadow_c)
-                    new_c_tg = st.number_input("Target", min_value=1.0, value=float(config["subjects"][mod_p_c]["children"][mod_c].get("target_hours", 10.0)), step=1.0)
+                    # 有子任务的节点目标由子树汇总, 与父科目一致
+                    c_has_children = len(c_node.get("children", {})) > 0
+                    new_c_tg = st.number_input("Target", min_value=1.0, value=float(c_node.get("target_hours", 10.0)), step=1.0, disabled=c_has_children)
                     
                     if st.button("Save", key="m_c_btn", type="primary", use_container_width=True):
-                        if new_c_name and new_c_name != mod_c:
-                            config["subjects"][mod_p_c]["children"][new_c_name] = config["subjects"][mod_p_c]["children"].pop(mod_c)
-                            update_csv_history("child_subject", mod_c, new_c_name)
-                        target_c_name = new_c_name if new_c_name else mod_c
-                        config["subjects"][mod_p_c]["children"][target_c_name]["target_hours"] = new_c_tg
-                        save_config(config)
+                        draft = edit_config()
+                        siblings = sibling_map(draft, c_path)
+                        if new_c_name and new_c_name != c_path[-1]:
+                            siblings[new_c_name] = siblings.pop(c_path[-1])
+                        target_c_name = new_c_name if new_c_name else c_path[-1]
+                        if not c_has_children:
+                            siblings[target_c_name]["target_hours"] = new_c_tg
+                        save_config(draft)
                         st.session_state.shadow_c_name = ""
                         st.rerun()
 
     with st.expander("Delete", expanded=False):
-        if config["subjects"]:
+        if subject_index["parents"]:
             del_type = st.radio("Type",["Parent", "Child"], horizontal=True, label_visibility="collapsed", key="del_rad")
             if del_type == "Parent":
-                del_p = st.selectbox("Select", list(config["subjects"].keys()), key="d_p_sel")
+                del_p = st.selectbox("Select", list(subject_index["parents"]), key="d_p_sel")
                 if st.button("Confirm Delete", key="d_p_btn", type="primary", use_container_width=True):
-                    del config["subjects"][del_p]
-                    save_config(config)
+                    draft = edit_config()
+                    archive_subject(draft, draft["subjects"].pop(del_p), del_p)
+                    save_config(draft)
                     st.rerun()
             else:
-                del_p_c = st.selectbox("Parent", list(config["subjects"].keys()), key="d_c_p_sel")
-                children_list = list(config["subjects"][del_p_c]["children"].keys())
+                del_p_c = st.selectbox("Parent", list(subject_index["parents"]), key="d_c_p_sel")
+                children_list = list(subject_index["tasks"][del_p_c])
                 if children_list:
                     del_c = st.selectbox("Task", children_list, key="d_c_sel")
                     if st.button("Confirm Delete", key="d_c_btn", type="primary", use_container_width=True):
-                        del config["subjects"][del_p_c]["children"][del_c]
-                        save_config(config)
+                        del_path = (del_p_c,) + task_path(del_c)
+                        draft = edit_config()
+                        archive_subject(draft, sibling_map(draft, del_path).pop(del_path[-1]), del_path[-1])
+                        save_config(draft)
                         st.rerun()
 
 # ==========================================
 # 5. Central Core L1: Absolute Balance
 # ==========================================
+profiler.section("L1 timer")
 col_l1_left, col_l1_center, col_l1_right = st.columns([1.5, 2, 1.5], vertical_alignment="center")
 
 with col_l1_right:
-    time_filter = st.radio("Dimension",["Today", "Week", "Month", "Year"], horizontal=True, label_visibility="collapsed")
-
-if time_filter == "Today":
-    filtered_df = df[df['timestamp'].dt.date == now.date()]
-    compare_start = now - timedelta(days=1)
-    compare_df = df[df['timestamp'].dt.date == compare_start.date()]
-    compare_label = "Yesterday"
-elif time_filter == "Week":
-    start_of_week = now - timedelta(days=now.weekday())
-    filtered_df = df[df['timestamp'].dt.date >= start_of_week.date()]
-    compare_start = start_of_week - timedelta(weeks=1)
-    compare_end = start_of_week
-    compare_df = df[(df['timestamp'].dt.date >= compare_start.date()) & (df['timestamp'].dt.date < compare_end.date())]
-    compare_label = "Last Week"
-elif time_filter == "Month":
-    filtered_df = df[(df['timestamp'].dt.year == now.year) & (df['timestamp'].dt.month == now.month)]
-    last_month = now.replace(day=1) - timedelta(days=1)
-    compare_df = df[(df['timestamp'].dt.year == last_month.year) & (df['timestamp'].dt.month == last_month.month)]
-    compare_label = "Last Month"
+    time_filter = st.radio("Dimension",["Today", "Week", "Month", "Year", "Custom"], horizontal=True, label_visibility="collapsed")
+    if time_filter == "Custom":
+        range_first, range_last = pick_date_range("dashboard_range", now)
+
+# 所有看板组件读取 日 x 科目 汇总 (SQLite 经按日前缀和索引, 数据变化时重建); 扫描行数在构建时计入
+if time_filter == "Custom":
+    range_days = (range_last - range_first).days + 1
+    filter_label, compare_label = f"{range_days} Days", f"Previous {range_days} Days"
+    comparison = range_comparison(range_first, range_last, now)
 else:
-    filtered_df = df[df['timestamp'].dt.year == now.year]
-    compare_df = df[df['timestamp'].dt.year == (now.year - 1)]
-    compare_label = "Last Year"
+    filter_label = time_filter
+    compare_label = {"Today": "Yesterday", "Week": "Last Week", "Month": "Last Month", "Year": "Last Year"}[time_filter]
+    comparison = period_comparison(time_filter, now)
+period_roll = comparison["current_roll"]
 
 with col_l1_left:
-    parent_subjects = list(config["subjects"].keys())
+    parent_subjects = list(subject_index["parents"])
     if not parent_subjects:
         st.markdown("<div style='color: var(--text-muted); font-weight: 500;'>Configure in Sidebar</div>", unsafe_allow_html=True)
         sel_parent, sel_child = None, None
@@ -533,8 +465,7 @@ with col_l1_left:
             sel_parent = st.selectbox("Subject", parent_subjects, index=None, disabled=(st.session_state.timer_state != 'idle'), label_visibility="collapsed")
         with c_sel2:
             if sel_parent:
-                child_dict = config["subjects"][sel_parent]["children"]
-                child_list = list(child_dict.keys())
+                child_list = list(subject_index["tasks"][sel_parent])
                 sel_child = st.selectbox("Task", child_list if child_list else["General"], disabled=(st.session_state.timer_state != 'idle'), label_visibility="collapsed")
             else:
                 sel_child = st.selectbox("Task",["Select Subject"], disabled=True, label_visibility="collapsed")
@@ -573,6 +504,7 @@ with col_l1_center:
                 }}, 1000);
             </script>
             """
+            import streamlit.components.v1 as components
             components.html(timer_html, height=85)
             c_btn1, c_btn2, c_btn3 = st.columns([1, 1.2, 1])
             with c_btn2:
@@ -580,14 +512,14 @@ with col_l1_center:
                     elapsed_sec = time.time() - st.session_state.start_time
                     elapsed_min = round(elapsed_sec / 60, 2)
                     score = get_focus_score(elapsed_min)
-                    new_log = pd.DataFrame([{
-                        "timestamp": datetime.now().isoformat(),
-                        "parent_subject": sel_parent,
-                        "child_subject": sel_child,
+                    parent_id, child_id = subject_ids(config, sel_parent, sel_child)
+                    journal.append({
+                        "timestamp": datetime.now(),
+                        "parent_subject": parent_id,
+                        "child_subject": child_id,
                         "duration_minutes": elapsed_min,
                         "focus_score": score
-                    }])
-                    new_log.to_csv(DATA_FILE, mode='a', header=False, index=False, encoding="utf-8")
+                    })
                     st.session_state.timer_state = 'idle'
                     st.rerun()
 
@@ -596,14 +528,14 @@ st.markdown("<div style='height: 40px;'></div>", unsafe_allow_html=True)
 # ==========================================
 # 7. Central Core L2: KPIs
 # ==========================================
-total_minutes = filtered_df['duration_minutes'].sum() if not filtered_df.empty else 0.0
-total_hours = total_minutes / 60
-active_subjects = filtered_df['parent_subject'].nunique() if not filtered_df.empty else 0
-avg_score = filtered_df['focus_score'].mean() if not filtered_df.empty else 0.0
+profiler.section("L2 KPIs")
+total_hours = comparison["current"]["hours"]
+active_subjects = comparison["current"]["active_subjects"]
+avg_score = comparison["current"]["avg_focus"]
 
 c1, c2, c3 = st.columns(3)
 with c1:
-    st.markdown(f"""<div class="glass-card kpi-container"><div class="kpi-title">Duration ({time_filter})</div><div class="kpi-value">{total_hours:.1f}<span>h</span></div></div>""", unsafe_allow_html=True)
+    st.markdown(f"""<div class="glass-card kpi-container"><div class="kpi-title">Duration ({filter_label})</div><div class="kpi-value">{total_hours:.1f}<span>h</span></div></div>""", unsafe_allow_html=True)
 with c2:
     st.markdown(f"""<div class="glass-card kpi-container"><div class="kpi-title">Active Subjects</div><div class="kpi-value">{active_subjects}</div></div>""", unsafe_allow_html=True)
 with c3:
@@ -614,39 +546,58 @@ st.markdown("<div style='height: 24px;'></div>", unsafe_allow_html=True)
 # ==========================================
 # 8. Central Core L3: Interactive Grid Gallery & Insights
 # ==========================================
+profiler.section("L3 gallery/insights")
 # 突破 2: 双栏对齐，确保顶部在同一水平线
 col_l3_left, col_l3_right = st.columns([2, 1], gap="large")
 
 with col_l3_left:
     st.markdown("<div class='section-title'>Subject Gallery</div>", unsafe_allow_html=True)
-    parent_group = filtered_df.groupby('parent_subject')['duration_minutes'].sum() if not filtered_df.empty else pd.Series()
-    
+    # 单次 (parent, child) 聚合, 循环内只做字典查找
+    subject_tree_totals = subject_totals(period_roll)
+    # 先序布局上的前缀和: 任意深度节点的子树合计都是一次区间相减, 不做递归遍历
+    layout_cum = layout_minutes(subject_index, period_roll)
+
+    # 惰性下钻: 只渲染当前展开节点的直接子节点 (及其下一层任务), 更深的层级不计算
+    expandable = [nid for nid in subject_index["order"] if subject_index["kids"][nid]]
+    gallery_node = None
+    if expandable:
+        gallery_node = st.selectbox(
+            "Gallery", [None] + expandable, key="gallery_drill", label_visibility="collapsed",
+            format_func=lambda nid: "All Subjects" if nid is None else task_label(subject_index["paths"][nid]),
+        )
+
+    # 突破 3: 变色解耦 (仅手动选中且未计时时高亮); 选中任务的祖先节点同样高亮
+    active_path = ()
+    if sel_parent is not None and st.session_state.timer_state == 'idle':
+        active_path = (sel_parent,) + (task_path(sel_child) if sel_child in subject_index["tasks"][sel_parent] else ())
+
     # 突破 3: 彻底解决代码外泄，全量遍历所有科目，使用纯 HTML 字符串拼接并一次性渲染
     gallery_html = "<div class='gallery-grid'>"
-    for parent, details in config["subjects"].items():
-        target_h = get_parent_target(parent)
-        current_m = parent_group.get(parent, 0.0)
-        current_h = current_m / 60
+    # 目标、ID 与顺序均来自预编译的科目树索引
+    for node_id in subject_index["kids"][gallery_node]:
+        node_path = subject_index["paths"][node_id]
+        target_h = subject_index["targets"][node_id]
+        current_h = subtree_total(subject_index, layout_cum, node_id) / 60
         progress_pct = min((current_h / target_h) * 100, 100)
         
-        # 突破 3: 变色解耦 (仅手动选中且未计时时高亮)
-        is_active = (sel_parent == parent) and (st.session_state.timer_state == 'idle') and (sel_parent is not None)
+        is_active = active_path[:len(node_path)] == node_path
         card_class = "active-glass-card-detail" if is_active else "glass-card-detail"
         
         tasks_html = ""
-        children = details.get("children", {})
+        children = subject_index["kids"][node_id]
         if not children:
             tasks_html = "<div style='color: var(--text-muted); font-size: 0.85rem;'>No specific tasks configured.</div>"
         else:
-            for child, c_details in children.items():
-                c_target = max(0.1, c_details.get("target_hours", 1.0))
-                c_current_m = filtered_df[(filtered_df['parent_subject'] == parent) & (filtered_df['child_subject'] == child)]['duration_minutes'].sum() if not filtered_df.empty else 0.0
-                c_current_h = c_current_m / 60
+            for child_id in children:
+                c_target = subject_index["targets"][child_id]
+                c_current_h = subtree_total(subject_index, layout_cum, child_id) / 60
                 c_prog = min((c_current_h / c_target) * 100, 100)
+                c_subtasks = len(subject_index["kids"][child_id])
+                c_hint = f" <span style='color: var(--text-muted);'>· {c_subtasks} sub-tasks</span>" if c_subtasks else ""
                 tasks_html += f"""
                 <div style="margin-bottom: 12px;">
                     <div style="display: flex; justify-content: space-between; font-size: 0.85rem; font-weight: 500;">
-                        <span>{child}</span>
+                        <span>{subject_index["paths"][child_id][-1]}{c_hint}</span>
                         <span>{c_current_h:.1f}h / {c_target:.1f}h</span>
                     </div>
                     <div class="pg-track" style="height: 4px; margin: 6px 0;"><div class="pg-fill" style="width: {c_prog:.1f}%; background-color: var(--theme-color);"></div></div>
@@ -656,7 +607,7 @@ with col_l3_left:
         gallery_html += f"""
         <details class="{card_class}">
             <summary>
-                <div style="font-family:'Inter'; font-weight:600; font-size:1.1rem; margin-bottom:12px;">{parent}</div>
+                <div style="font-family:'Inter'; font-weight:600; font-size:1.1rem; margin-bottom:12px;">{node_path[-1]}</div>
                 <div class="pg-track"><div class="pg-fill" style="width: {progress_pct:.1f}%;"></div></div>
                 <div class="pg-label" style="margin-top: 8px;">
                     <span>{current_h:.1f}h / {target_h:.1f}h</span>
@@ -681,94 +632,65 @@ with col_l3_right:
     if time_filter == "Today": gauge_max = 6.0
     elif time_filter == "Week": gauge_max = 40.0
     elif time_filter == "Month": gauge_max = 160.0
+    elif time_filter == "Custom": gauge_max = 6.0 * range_days
     else: gauge_max = 1800.0
     
-    compare_val = compare_df['duration_minutes'].sum() / 60 if not compare_df.empty else 0.0
-
-    fig_gauge = go.Figure(go.Indicator(
-        mode = "gauge+number+delta",
-        value = total_hours,
-        number = {'valueformat': ".1f"},
-        title = {'text': f"{time_filter} vs {compare_label}", 'font': {'size': 14, 'color': '#5A5A5E', 'family': 'Inter'}},
-        delta = {'reference': compare_val, 'increasing': {'color': safe_theme_color}, 'valueformat': ".1f"},
-        gauge = {
-            'axis': {'range': [0, gauge_max], 'tickwidth': 1, 'tickcolor': "rgba(255,255,255,0)"},
-            'bar': {'color': safe_theme_color},
-            'bgcolor': "rgba(255,255,255,0.3)",
-            'borderwidth': 0,
-            'threshold': {'line': {'color': 'white', 'width': 2}, 'thickness': 0.75, 'value': gauge_max * 0.8}
-        }
-    ))
-    fig_gauge.update_layout(height=180, margin=dict(l=20, r=20, t=40, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font={'family': "Inter, sans-serif"})
+    compare_val = comparison["previous"]["hours"]
+
+    # plotly 在首次用到时才导入; 图表按聚合输入缓存, 数据不变时直接复用
+    fig_gauge = gauge_figure(total_hours, compare_val, gauge_max, f"{filter_label} vs {compare_label}", safe_theme_color)
     st.plotly_chart(fig_gauge, use_container_width=True, config={'displayModeBar': False})
     st.markdown("</div>", unsafe_allow_html=True)
     
     # 2. Monochromatic Pie Chart
     st.markdown("<div class='glass-card' style='padding: 24px;'>", unsafe_allow_html=True)
-    if not filtered_df.empty and total_hours > 0:
-        fig_pie = px.pie(filtered_df, names='parent_subject', values='duration_minutes', hole=0.75, color_discrete_sequence=palette)
-        # 突破 5: 环形图开启引导线，百分比显示在圆环外部
-        fig_pie.update_traces(textposition='outside', textinfo='percent', marker=dict(line=dict(color='rgba(255,255,255,0.6)', width=1)))
-        fig_pie.update_layout(
-            title={'text': "Distribution", 'font': {'size': 14, 'color': '#5A5A5E', 'family': 'Inter'}, 'x': 0.5, 'xanchor': 'center'},
-            showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
-            height=260, margin=dict(l=40, r=40, t=40, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font={'family': "Inter, sans-serif"}
-        )
-        fig_pie.add_annotation(text=f"<b>{total_hours:.1f}h</b>", x=0.5, y=0.5, font_size=24, showarrow=False, font_color=safe_theme_color)
+    if not period_roll.empty and total_hours > 0:
+        # 只把父级汇总 (每科一片) 交给 Plotly; 下钻时在服务端取该科的子任务汇总
+        drill_options = ["All Subjects"] + [subject_names.get(pid, pid) for pid in subject_tree_totals]
+        drill = st.selectbox("Distribution", drill_options, key="pie_drill", label_visibility="collapsed")
+        if drill == "All Subjects":
+            slices = {pid: node["minutes"] for pid, node in subject_tree_totals.items()}
+            pie_title, pie_hours = "Distribution", total_hours
+        else:
+            drill_id = next(pid for pid in subject_tree_totals if subject_names.get(pid, pid) == drill)
+            # 现存科目按直接子节点的子树合计切片 (任意深度); 已删除科目沿用日志中的子任务
+            slices = (node_breakdown(subject_index, layout_cum, drill_id) if drill_id in subject_index["pos"]
+                      else subject_tree_totals[drill_id]["children"])
+            pie_title, pie_hours = drill, subject_tree_totals[drill_id]["minutes"] / 60
+        pie_names = tuple(subject_names.get(sid, sid) for sid in slices)
+        # 每个科目固定一种颜色 (按树中位置分配), 下钻与周期切换时颜色不跳变
+        pie_colors = tuple(subject_index["colors"].get(sid, palette[k % len(palette)]) for k, sid in enumerate(slices))
+        fig_pie = pie_figure(pie_names, tuple(float(m) for m in slices.values()), pie_hours, pie_colors, safe_theme_color, pie_title)
         st.plotly_chart(fig_pie, use_container_width=True, config={'displayModeBar': False})
     else:
         st.markdown("<div style='height: 260px; display: flex; align-items: center; justify-content: center; color: var(--text-muted); font-weight: 500;'>No data available</div>", unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
 # ==========================================
-# 9. Central Core L4: 2026 Heatmap
+# 9. Central Core L4: Annual Heatmap
 # ==========================================
-st.markdown("<div class='section-title' style='margin-top: 16px;'>Annual Activity (2026)</div>", unsafe_allow_html=True)
+profiler.section("L4 heatmap")
+first_day = datacache.cached(("first_day", DATA_FILE), [DATA_FILE], store.first_day)
+heatmap_options = [ROLLING_WINDOW] + list(range(now.year, (first_day.year if first_day else now.year) - 1, -1))
+
+col_heat_title, col_heat_sel = st.columns([3, 1], vertical_alignment="bottom")
+with col_heat_sel:
+    heatmap_sel = st.selectbox("Heatmap Range", heatmap_options, index=1, label_visibility="collapsed")
+with col_heat_title:
+    st.markdown(f"<div class='section-title' style='margin-top: 16px;'>Annual Activity ({heatmap_sel})</div>", unsafe_allow_html=True)
 st.markdown("<div class='glass-card' style='padding: 28px;'>", unsafe_allow_html=True)
 
-curr_year = 2026
-start_date = datetime(curr_year, 1, 1).date()
-end_date = datetime(curr_year, 12, 31).date()
-date_range = pd.date_range(start=start_date, end=end_date)
-
-heatmap_df = pd.DataFrame({'date': date_range})
-heatmap_df['date_str'] = heatmap_df['date'].dt.strftime('%Y-%m-%d')
+# 向量化按日分箱; 网格和图表一起缓存, 数据文件不变时重跑不做任何构建 (扫描行数也只在构建时计入)
+def build_heatmap():
+    grid = heatmap_grid(store, heatmap_sel, now.date())
+    profiler.rows(grid["rows"])
+    return heatmap_figure(grid, safe_theme_color)
 
-if not df.empty:
-    df['date_str'] = df['timestamp'].dt.strftime('%Y-%m-%d')
-    daily_sum = df.groupby('date_str')['duration_minutes'].sum().reset_index()
-    heatmap_df = pd.merge(heatmap_df, daily_sum, on='date_str', how='left').fillna(0)
-else:
-    heatmap_df['duration_minutes'] = 0.0
-
-heatmap_df['day_of_year'] = heatmap_df['date'].dt.dayofyear
-heatmap_df['x'] = (heatmap_df['day_of_year'] - 1) // 7
-heatmap_df['y'] = heatmap_df['date'].dt.weekday
-
-fig_heat = go.Figure(data=go.Heatmap(
-    z=heatmap_df['duration_minutes'],
-    x=heatmap_df['x'],
-    y=heatmap_df['y'],
-    colorscale=[[0, 'rgba(255,255,255,0.4)'],[1, safe_theme_color]],
-    xgap=4, ygap=4,
-    showscale=False,
-    hoverinfo='text',
-    text=heatmap_df['date_str'] + '<br>Duration: ' + heatmap_df['duration_minutes'].astype(str) + ' min'
-))
-
-fig_heat.update_layout(
-    height=160,
-    plot_bgcolor='rgba(0,0,0,0)',
-    paper_bgcolor='rgba(0,0,0,0)',
-    margin=dict(t=10, b=20, l=30, r=10),
-    xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-    yaxis=dict(
-        showgrid=False, zeroline=False, 
-        tickmode='array', tickvals=[0, 2, 4, 6], 
-        ticktext=['Mon', 'Wed', 'Fri', 'Sun'], 
-        autorange='reversed',
-        tickfont=dict(color="#5A5A5E", family="Inter, sans-serif", size=12)
-    )
-)
+fig_heat = datacache.cached(("heatmap", DATA_FILE, heatmap_sel, now.date(), safe_theme_color), [DATA_FILE], build_heatmap)
 st.plotly_chart(fig_heat, use_container_width=True, config={'displayModeBar': False})
-st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown("</div>", unsafe_allow_html=True)
+
+profile_sections = profiler.finish()
+if profiler.enabled:
+    with st.expander("Rerun Profiler", expanded=False):
+        st.dataframe(pd.DataFrame(profile_sections), hide_index=True, use_container_width=True)
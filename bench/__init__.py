@@ -0,0 +1,6 @@
+"""Synthetic data generator and per-stage timing harness for the Focus dashboard.
+
+    python -m bench.generate --rows 100000 --out bench_data
+    python -m bench.run --rows 1000 100000 1000000 --out results.json
+    python -m bench.compare baseline.json results.json
+"""
@@ -0,0 +1,38 @@
+"""Compare two bench.run JSON files; exit 1 if any stage regressed past the threshold."""
+import argparse
+import json
+import sys
+
+
+def _index(report):
+    return {
+        (r["rows"], r["backend"], stage): timing["median_s"]
+        for r in report["results"]
+        for stage, timing in r["stages"].items()
+        if "median_s" in timing
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=1.25, help="candidate/baseline ratio counted as a regression")
+    args = parser.parse_args(argv)
+    with open(args.baseline, encoding="utf-8") as f:
+        base = _index(json.load(f))
+    with open(args.candidate, encoding="utf-8") as f:
+        cand = _index(json.load(f))
+
+    regressions = 0
+    for key in sorted(base.keys() & cand.keys()):
+        ratio = cand[key] / base[key] if base[key] > 0 else float("inf")
+        flag = "REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        rows, backend, stage = key
+        print(f"{rows:>10} {backend:<7} {stage:<12} {base[key] * 1000:9.2f}ms -> {cand[key] * 1000:9.2f}ms  x{ratio:5.2f} {flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Synthetic learning_logs.csv / subjects.json generator (1k to 10M rows)."""
+import argparse
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from storage import LOG_COLUMNS, epoch_columns
+from subjects import GENERAL_TASK, ensure_subject_ids
+
+CHUNK_ROWS = 1_000_000
+
+
+def build_subject_tree(parents=5, children_per_parent=8, childless_parents=1, seed=0):
+    """subjects.json with `parents` subjects; the last `childless_parents` have no tasks."""
+    rng = np.random.default_rng(seed)
+    config = {"theme_color": "#007AFF", "subjects": {}}
+    for p in range(parents):
+        n_children = 0 if p >= parents - childless_parents else children_per_parent
+        children = {
+            f"Task {p + 1}.{c + 1}": {"target_hours": float(rng.integers(10, 80))}
+            for c in range(n_children)
+        }
+        config["subjects"][f"Subject {p + 1}"] = {"target_hours": 50.0, "children": children}
+    ensure_subject_ids(config)
+    config["log_subject_ids"] = True
+    return config
+
+
+def _leaf_ids(config):
+    leaves = []
+    for parent_data in config["subjects"].values():
+        children = parent_data.get("children", {})
+        if children:
+            leaves.extend((parent_data["id"], c["id"]) for c in children.values())
+        else:
+            leaves.append((parent_data["id"], GENERAL_TASK))
+    return leaves
+
+
+def generate_sessions(config, rows, years=3.0, end=None, seed=0):
+    """Yield time-ordered session chunks spread uniformly over the last `years` years."""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end or datetime.now()).floor("s")
+    span_s = int(years * 365 * 86400)
+    offsets = np.sort(rng.integers(0, span_s, rows))
+    leaves = _leaf_ids(config)
+    # A few subjects get most of the time, like a real log
+    weights = 1.0 / np.arange(1, len(leaves) + 1)
+    weights /= weights.sum()
+    for lo in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - lo)
+        ts = end - pd.Timedelta(seconds=span_s) + pd.to_timedelta(offsets[lo:lo + n], unit="s")
+        epoch, utc_offset = epoch_columns(ts)
+        minutes = np.round(np.clip(rng.lognormal(3.2, 0.7, n), 1, 240), 2)
+        # Same thresholds as get_focus_score
+        focus = 1 + (minutes >= 5) + (minutes > 15) + (minutes > 30) + (minutes > 45)
+        picks = rng.choice(len(leaves), size=n, p=weights)
+        yield pd.DataFrame({
+            "timestamp": epoch,
+            "utc_offset": utc_offset,
+            "parent_subject": [leaves[i][0] for i in picks],
+            "child_subject": [leaves[i][1] for i in picks],
+            "duration_minutes": minutes,
+            "focus_score": focus.astype(int),
+        }, columns=LOG_COLUMNS)
+
+
+def write_dataset(out_dir, rows=None, users=1, years=3.0, sessions_per_day=6.0,
+                  parents=5, children_per_parent=8, end=None, seed=0):
+    """Write one learning_logs.csv + subjects.json per user; returns the user directories."""
+    if rows is None:
+        rows = int(years * 365 * sessions_per_day)
+    user_dirs = []
+    for u in range(users):
+        user_dir = out_dir if users == 1 else os.path.join(out_dir, f"user_{u + 1}")
+        os.makedirs(user_dir, exist_ok=True)
+        config = build_subject_tree(parents, children_per_parent, seed=seed + u)
+        with open(os.path.join(user_dir, "subjects.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, indent=4)
+        log_path = os.path.join(user_dir, "learning_logs.csv")
+        header = True
+        for chunk in generate_sessions(config, rows, years, end, seed + u):
+            chunk.to_csv(log_path, mode="w" if header else "a", header=header, index=False, encoding="utf-8")
+            header = False
+        user_dirs.append(user_dir)
+    return user_dirs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--rows", type=int, help="sessions per user (overrides --sessions-per-day)")
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--sessions-per-day", type=float, default=6.0)
+    parser.add_argument("--parents", type=int, default=5)
+    parser.add_argument("--children", type=int, default=8, help="tasks per parent")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    dirs = write_dataset(args.out, args.rows, args.users, args.years, args.sessions_per_day,
+                         args.parents, args.children, seed=args.seed)
+    print(json.dumps({"user_dirs": dirs}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""Time each dashboard pipeline stage of app2.0.7.py and emit JSON results."""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from bench.generate import write_dataset
+from charts import pie_figure
+from heatmap import HOVER_TEMPLATE, heatmap_grid
+from periods import PERIODS, build_day_index, compare_periods, compare_ranges, custom_windows, period_window, previous_window
+from storage import CsvStore, ParquetStore, SqliteStore, import_csv, invalidate
+from subjects import build_subject_index, layout_minutes, subject_totals, subtree_total
+
+APP_VERSION = "2.0.7"
+# Stand-in for the theme palette the dashboard derives from the theme color
+PALETTE = ("#007AFF", "#3395FF", "#66AFFF", "#0062CC", "#004A99")
+STAGES = ["load", "time_filter", "kpis", "gallery", "pie", "heatmap", "report", "day_index"]
+
+
+def open_backend(backend, data_dir):
+    csv_path = os.path.join(data_dir, "learning_logs.csv")
+    if backend == "csv":
+        return CsvStore(csv_path)
+    if backend == "parquet":
+        store = ParquetStore(os.path.join(data_dir, "learning_logs.parquet"))
+    else:
+        store = SqliteStore(os.path.join(data_dir, "learning_logs.db"))
+    if not os.path.exists(store.path):
+        store.init()
+        import_csv(csv_path, store)
+    return store
+
+
+def _payload_bytes(fig):
+    return len(fig.to_json().encode("utf-8"))
+
+
+def stage_load(ctx):
+    store = ctx["store"]
+    if isinstance(store, CsvStore):
+        invalidate(store.path)
+        store.load()
+    else:
+        # Cold read of the range the dashboard touches (this and last year)
+        if isinstance(store, ParquetStore):
+            ParquetStore._month_cache.clear()
+        store.query(datetime(ctx["anchor"].year - 1, 1, 1), None)
+
+
+def stage_time_filter(ctx):
+    for period in PERIODS:
+        ctx["periods"][period] = compare_periods(ctx["store"], period, ctx["anchor"])
+
+
+def stage_kpis(ctx):
+    current = ctx["periods"]["Year"]["current"]
+    return current["hours"], current["active_subjects"], current["avg_focus"]
+
+
+def stage_gallery(ctx):
+    index = build_subject_index(ctx["config"])
+    cum = layout_minutes(index, ctx["periods"]["Year"]["current_roll"])
+    # Top-level cards plus their direct tasks, as the collapsed gallery renders them
+    cells = []
+    for node_id in index["kids"][None]:
+        cells.append(subtree_total(index, cum, node_id))
+        cells.extend(subtree_total(index, cum, kid) for kid in index["kids"][node_id])
+    return cells
+
+
+def stage_pie(ctx):
+    # As the dashboard does it: one slice per subject from subject_totals, named and colored by the index
+    index = build_subject_index(ctx["config"], PALETTE)
+    current = ctx["periods"]["Year"]["current"]
+    slices = {pid: node["minutes"] for pid, node in subject_totals(ctx["periods"]["Year"]["current_roll"]).items()}
+    names = tuple(index["names"].get(sid, sid) for sid in slices)
+    colors = tuple(index["colors"].get(sid, PALETTE[k % len(PALETTE)]) for k, sid in enumerate(slices))
+    # pie_figure is lru_cached for the app; repeats would otherwise time only the JSON encode
+    fig = pie_figure.__wrapped__(names, tuple(float(m) for m in slices.values()), current["hours"], colors, PALETTE[0])
+    return _payload_bytes(fig)
+
+
+def stage_heatmap(ctx):
+    import plotly.graph_objects as go
+    grid = heatmap_grid(ctx["store"], ctx["anchor"].year, ctx["anchor"].date())
+    fig = go.Figure(data=go.Heatmap(
+        z=grid["z"], x=grid["x"], y=grid["y"], customdata=grid["customdata"], hovertemplate=HOVER_TEMPLATE,
+    ))
+    return _payload_bytes(fig)
+
+
+def stage_report(ctx):
+    out = []
+    for period in ("Week", "Month", "Year"):
+        comparison = compare_periods(ctx["store"], period, ctx["anchor"])
+        out.append((comparison["current"]["hours"], comparison["growth_pct"], comparison["current"]["top_subject"]))
+    return out
+
+
+def stage_day_index(ctx):
+    # As the dashboard does it: with a persisted rollup, one whole-history read, then every
+    # fixed window plus a custom range as prefix-sum lookups; frame stores index only the range
+    store, anchor = ctx["store"], ctx["anchor"]
+    last_day = anchor.date()
+    custom, previous = custom_windows(last_day - timedelta(days=16), last_day)
+    if not store.persisted_rollup:
+        index = build_day_index(store, previous[0], custom[1])
+        return [compare_ranges(index, custom, previous, anchor)["current"]["hours"]]
+    index = build_day_index(store)
+    out = []
+    for period in PERIODS:
+        window = period_window(period, anchor)
+        out.append(compare_ranges(index, window, previous_window(period, window[0]), anchor, period))
+    out.append(compare_ranges(index, custom, previous, anchor))
+    return [comparison["current"]["hours"] for comparison in out]
+
+
+STAGE_FUNCS = {
+    "load": stage_load,
+    "time_filter": stage_time_filter,
+    "kpis": stage_kpis,
+    "gallery": stage_gallery,
+    "pie": stage_pie,
+    "heatmap": stage_heatmap,
+    "report": stage_report,
+    "day_index": stage_day_index,
+}
+
+
+def time_stage(func, ctx, repeat):
+    runs, payload = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func(ctx)
+        runs.append(time.perf_counter() - t0)
+        if func in (stage_pie, stage_heatmap):
+            payload = result
+    timing = {"min_s": min(runs), "median_s": statistics.median(runs), "runs": repeat}
+    if payload is not None:
+        timing["payload_bytes"] = payload
+    return timing
+
+
+def run_dataset(data_dir, backend, repeat, stages, anchor):
+    with open(os.path.join(data_dir, "subjects.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    t0 = time.perf_counter()
+    store = open_backend(backend, data_dir)
+    setup_s = time.perf_counter() - t0
+    ctx = {"store": store, "config": config, "anchor": anchor, "periods": {}}
+    results = {"setup_s": setup_s, "stages": {}}
+    # time_filter fills ctx["periods"] for the later stages
+    for stage in ["load", "time_filter"] + [s for s in stages if s not in ("load", "time_filter")]:
+        try:
+            timing = time_stage(STAGE_FUNCS[stage], ctx, repeat)
+        except ImportError as exc:
+            timing = {"skipped": str(exc)}
+        if stage in stages:
+            results["stages"][stage] = timing
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--backend", nargs="+", choices=["csv", "sqlite", "parquet"], default=["csv", "sqlite"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--years", type=float, default=3.0)
+    parser.add_argument("--parents", type=int, default=5)
+    parser.add_argument("--children", type=int, default=8)
+    parser.add_argument("--data-dir", help="reuse/keep generated datasets here instead of a temp dir")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    anchor = datetime.now()
+    report = {
+        "app_version": APP_VERSION,
+        "created": anchor.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "results": [],
+    }
+    root = args.data_dir or tempfile.mkdtemp(prefix="focus-bench-")
+    for rows in args.rows:
+        data_dir = os.path.join(root, f"rows_{rows}")
+        if not os.path.exists(os.path.join(data_dir, "learning_logs.csv")):
+            write_dataset(data_dir, rows=rows, years=args.years, parents=args.parents,
+                          children_per_parent=args.children, end=anchor)
+        for backend in args.backend:
+            result = run_dataset(data_dir, backend, args.repeat, args.stages, anchor)
+            report["results"].append({"rows": rows, "backend": backend, **result})
+            print(f"{rows:>10} {backend:<7} " + " ".join(
+                f"{k}={v.get('median_s', float('nan')) * 1000:.1f}ms" for k, v in result["stages"].items()
+            ), file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
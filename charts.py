@@ -0,0 +1,84 @@
+"""Plotly figures for the dashboard, built lazily and cached by their aggregated input.
+
+plotly is imported on first use instead of at app import, so the timer
+controls paint before the chart stack loads. Figures are cached per input
+and shared between sessions; st.plotly_chart only reads them. An unchanged
+chart therefore skips construction, and its spec serializes byte-identical,
+so Streamlit's forward-message cache sends the client just a reference.
+"""
+from functools import lru_cache
+
+from heatmap import HOVER_TEMPLATE
+
+TITLE_FONT = {'size': 14, 'color': '#5A5A5E', 'family': 'Inter'}
+
+
+@lru_cache(maxsize=64)
+def gauge_figure(value, reference, gauge_max, title, color):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Indicator(
+        mode = "gauge+number+delta",
+        value = value,
+        number = {'valueformat': ".1f"},
+        title = {'text': title, 'font': TITLE_FONT},
+        delta = {'reference': reference, 'increasing': {'color': color}, 'valueformat': ".1f"},
+        gauge = {
+            'axis': {'range': [0, gauge_max], 'tickwidth': 1, 'tickcolor': "rgba(255,255,255,0)"},
+            'bar': {'color': color},
+            'bgcolor': "rgba(255,255,255,0.3)",
+            'borderwidth': 0,
+            'threshold': {'line': {'color': 'white', 'width': 2}, 'thickness': 0.75, 'value': gauge_max * 0.8}
+        }
+    ))
+    fig.update_layout(height=180, margin=dict(l=20, r=20, t=40, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font={'family': "Inter, sans-serif"})
+    return fig
+
+
+@lru_cache(maxsize=64)
+def pie_figure(names, minutes, total_hours, palette, color, title="Distribution"):
+    """names/minutes: one slice per subject (or per task when drilled down), in display order."""
+    import plotly.express as px
+
+    fig = px.pie(names=list(names), values=list(minutes), hole=0.75, color_discrete_sequence=list(palette))
+    # 突破 5: 环形图开启引导线，百分比显示在圆环外部
+    fig.update_traces(textposition='outside', textinfo='percent', marker=dict(line=dict(color='rgba(255,255,255,0.6)', width=1)))
+    fig.update_layout(
+        title={'text': title, 'font': TITLE_FONT, 'x': 0.5, 'xanchor': 'center'},
+        showlegend=True, legend=dict(orientation="h", yanchor="bottom", y=-0.2, xanchor="center", x=0.5),
+        height=260, margin=dict(l=40, r=40, t=40, b=10), paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font={'family': "Inter, sans-serif"}
+    )
+    fig.add_annotation(text=f"<b>{total_hours:.1f}h</b>", x=0.5, y=0.5, font_size=24, showarrow=False, font_color=color)
+    return fig
+
+
+def heatmap_figure(grid, color):
+    """Not cached here: the caller keys it on the data file together with the grid."""
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=go.Heatmap(
+        z=grid['z'],
+        x=grid['x'],
+        y=grid['y'],
+        customdata=grid['customdata'],
+        hovertemplate=HOVER_TEMPLATE,
+        colorscale=[[0, 'rgba(255,255,255,0.4)'],[1, color]],
+        xgap=4, ygap=4,
+        showscale=False,
+    ))
+
+    fig.update_layout(
+        height=160,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        margin=dict(t=10, b=20, l=30, r=10),
+        xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+        yaxis=dict(
+            showgrid=False, zeroline=False,
+            tickmode='array', tickvals=[0, 2, 4, 6],
+            ticktext=['Mon', 'Wed', 'Fri', 'Sun'],
+            autorange='reversed',
+            tickfont=dict(color="#5A5A5E", family="Inter, sans-serif", size=12)
+        )
+    )
+    return fig
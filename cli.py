@@ -0,0 +1,114 @@
+"""Headless session CLI for shell hooks and editor integrations.
+
+    python cli.py start Engineering "System Design"
+    python cli.py status
+    python cli.py stop
+    python cli.py log Design --minutes 45 [--at "2026-10-16 21:30"]
+    python cli.py today | week
+    python cli.py --user alice status
+
+start/stop/status/log only touch small files: the running session is kept
+in <data file>.active and finished sessions go to the append journal, which
+the dashboard compacts into the store on its next rerun. Nothing here imports
+streamlit or plotly, and pandas is only loaded by the today/week summaries.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from journal import AppendJournal, journal_path
+from profiles import DEFAULT_PROFILE
+from subjects import subject_name_map
+from tracker import (
+    TrackerError, data_paths, load_config, log_session, read_active, start_session, stop_session,
+)
+
+
+def cmd_start(args, data_file, config_file):
+    active = start_session(data_file, config_file, args.parent, args.child)
+    print(f"started {active['parent']} / {active['child']}")
+
+
+def cmd_stop(args, data_file, config_file):
+    active = read_active(data_file)
+    record = stop_session(data_file, config_file)
+    print(f"logged {active['parent']} / {active['child']}: "
+          f"{record['duration_minutes']:.2f} min, focus {record['focus_score']}")
+
+
+def cmd_status(args, data_file, config_file):
+    active = read_active(data_file)
+    if active is None:
+        print("idle")
+        return
+    elapsed = int(time.time() - active["start"])
+    print(f"running {active['parent']} / {active['child']} "
+          f"{elapsed // 3600:02d}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}")
+
+
+def cmd_log(args, data_file, config_file):
+    ended_at = args.at or datetime.now()
+    record = log_session(data_file, config_file, args.parent, args.child, args.minutes, ended_at)
+    print(f"logged {args.parent}: {record['duration_minutes']:.2f} min at {ended_at:%Y-%m-%d %H:%M}")
+
+
+def cmd_summary(args, data_file, config_file):
+    from periods import compare_periods
+    from storage import open_store
+
+    config = load_config(config_file)
+    if not os.path.exists(data_file):
+        raise TrackerError(f"{data_file} not found; open the dashboard once to create it")
+    store = open_store(data_file)
+    # Runs pending schema migrations (e.g. epoch columns) before journaled rows are written
+    store.init()
+    AppendJournal(journal_path(data_file), store).compact()
+
+    period = "Today" if args.command == "today" else "Week"
+    comparison = compare_periods(store, period, datetime.now())
+    current, roll = comparison["current"], comparison["current_roll"]
+    print(f"{period}: {current['hours']:.1f}h over {current['sessions']} sessions "
+          f"({comparison['growth_pct']:+.1f}% vs previous)")
+    if current["sessions"]:
+        names = subject_name_map(config)
+        print(f"avg focus {current['avg_focus']:.1f}")
+        by_parent = roll.groupby("parent_subject", observed=True)["duration_minutes"].sum().sort_values(ascending=False)
+        for parent_id, parent_minutes in by_parent.items():
+            print(f"  {names.get(parent_id, parent_id):<20} {parent_minutes / 60:6.1f}h")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="cli.py", description="Focus session tracker (headless)")
+    parser.add_argument("--user", default=DEFAULT_PROFILE, help="profile name (same as ?user= in the dashboard)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    start = commands.add_parser("start", help="start a session")
+    start.add_argument("parent")
+    start.add_argument("child", nargs="?", help='task, nested tasks as a path: "Algorithms/Graphs"')
+    start.set_defaults(handler=cmd_start)
+
+    commands.add_parser("stop", help="stop and log the running session").set_defaults(handler=cmd_stop)
+    commands.add_parser("status", help="show the running session").set_defaults(handler=cmd_status)
+
+    log = commands.add_parser("log", help="log a finished session manually")
+    log.add_argument("parent")
+    log.add_argument("child", nargs="?", help='task, nested tasks as a path: "Algorithms/Graphs"')
+    log.add_argument("--minutes", type=float, required=True)
+    log.add_argument("--at", type=datetime.fromisoformat, help="end time, ISO format (default: now)")
+    log.set_defaults(handler=cmd_log)
+
+    commands.add_parser("today", help="today's totals").set_defaults(handler=cmd_summary)
+    commands.add_parser("week", help="this week's totals").set_defaults(handler=cmd_summary)
+
+    args = parser.parse_args(argv)
+    data_file, config_file = data_paths(args.user)
+    try:
+        args.handler(args, data_file, config_file)
+    except TrackerError as exc:
+        sys.exit(str(exc))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Process-wide read cache shared by every browser session.
+
+Streamlit re-executes the app script per session and per interaction, but
+imported modules live once per server process, so entries here are parsed
+once no matter how many tabs are open. Each entry is stamped with the
+(mtime_ns, size) signature of the files it was read from plus a write
+generation bumped by touch(); writes by other processes change the
+signature, writes through the app call touch(). Values are shared, not
+copied: callers treat them as read-only (pandas copy-on-write keeps an
+accidental in-place edit local to the caller).
+
+Entries are bounded per profile (the directory of an entry's first path), so
+one busy profile cannot evict everyone else's, and only the most recently
+used profiles are kept at all.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# Per profile: enough for every period x anchor day x heatmap range a dashboard shows
+MAX_ENTRIES = 128
+# Profiles with cached entries; the least recently used one is dropped whole
+MAX_PROFILES = 16
+
+_lock = threading.Lock()
+# profile dir -> OrderedDict(key -> (signature, value)), least recently used first at both levels
+_entries = OrderedDict()
+# path -> count of writes made through the app
+_generations = {}
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def file_signature(path):
+    """Change stamp of a file, a SQLite db with its -wal sidecar, or a Parquet archive directory."""
+    if os.path.isdir(path):
+        parts = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            parts.extend((os.path.join(root, name), _stat(os.path.join(root, name))) for name in sorted(files))
+        stamp = tuple(parts)
+    else:
+        stamp = (_stat(path), _stat(path + "-wal"))
+    return stamp, _generations.get(path, 0)
+
+
+def touch(path):
+    """Invalidate entries read from path after the app wrote to it."""
+    with _lock:
+        _generations[path] = _generations.get(path, 0) + 1
+
+
+def _profile(paths):
+    return os.path.dirname(os.path.abspath(paths[0])) if paths else ""
+
+
+def cached(key, paths, compute):
+    """Return the shared value for key, recomputing it when any of paths changed."""
+    signature = tuple(file_signature(p) for p in paths)
+    profile = _profile(paths)
+    with _lock:
+        entries = _entries.get(profile)
+        entry = entries.get(key) if entries is not None else None
+        if entry is not None and entry[0] == signature:
+            entries.move_to_end(key)
+            _entries.move_to_end(profile)
+            return entry[1]
+    value = compute()
+    with _lock:
+        entries = _entries.setdefault(profile, OrderedDict())
+        entries[key] = (signature, value)
+        entries.move_to_end(key)
+        _entries.move_to_end(profile)
+        while len(entries) > MAX_ENTRIES:
+            entries.popitem(last=False)
+        while len(_entries) > MAX_PROFILES:
+            _entries.popitem(last=False)
+    return value
+
+
+def clear():
+    with _lock:
+        _entries.clear()
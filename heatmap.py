@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+ROLLING_WINDOW = "Last 365 Days"
+HOVER_TEMPLATE = "%{customdata[0]}-%{customdata[1]:02d}-%{customdata[2]:02d}<br>Duration: %{z:.1f} min<extra></extra>"
+
+
+def build_grid(daily, start, end):
+    """Bin daily minutes into a GitHub-style week x weekday grid for [start, end).
+
+    daily is a Series of minutes indexed by 'YYYY-MM-DD'. Days become integer
+    offsets from start and are summed with np.bincount; no per-row strftime.
+    """
+    start = np.datetime64(start, "D")
+    n_days = int((np.datetime64(end, "D") - start).astype(np.int64))
+    minutes = np.zeros(n_days)
+    if len(daily):
+        offsets = (np.asarray(daily.index, dtype="datetime64[D]") - start).astype(np.int64)
+        keep = (offsets >= 0) & (offsets < n_days)
+        minutes = np.bincount(offsets[keep], weights=daily.to_numpy(dtype=float)[keep], minlength=n_days)
+
+    days = start + np.arange(n_days)
+    # 1970-01-01 was a Thursday; shift so Monday is 0
+    weekday = (days.astype(np.int64) + 3) % 7
+    month_start = days.astype("datetime64[M]")
+    customdata = np.column_stack([
+        days.astype("datetime64[Y]").astype(np.int64) + 1970,
+        month_start.astype(np.int64) % 12 + 1,
+        (days - month_start.astype("datetime64[D]")).astype(np.int64) + 1,
+    ])
+    return {
+        "z": minutes,
+        "x": (np.arange(n_days) + weekday[0]) // 7,
+        "y": weekday,
+        "customdata": customdata,
+    }
+
+
+def heatmap_window(selection, today):
+    """[start, end) for a year number or the rolling 365-day window ending today."""
+    if selection == ROLLING_WINDOW:
+        return today - timedelta(days=364), today + timedelta(days=1)
+    return date(selection, 1, 1), date(selection + 1, 1, 1)
+
+
+def heatmap_grid(store, selection, today):
+    """Grid of one heatmap selection, read as a daily_totals range query.
+
+    Not cached here: back-dated sessions (cli.py log --at, POST /sessions,
+    journal compaction) can land in a finished year, so callers cache the
+    grid against the store's file signature (datacache in the dashboard).
+    "rows" is how many daily totals the query returned.
+    """
+    start, end = heatmap_window(selection, today)
+    daily = store.daily_totals(start, end)
+    grid = build_grid(daily, start, end)
+    grid["rows"] = len(daily)
+    return grid
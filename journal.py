@@ -0,0 +1,208 @@
+import json
+import os
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def _locked(lock_path):
+    """Exclusive inter-process lock so concurrent tabs/processes never interleave."""
+    with open(lock_path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _encode(value):
+    """JSON fallback for timestamps; stores convert the ISO text on compaction."""
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"cannot journal {type(value).__name__}")
+
+
+def _frame(payload):
+    body = payload.encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _scan(raw):
+    """Decode framed lines; stops at the first torn or corrupt line. Returns (records, valid_bytes)."""
+    records, offset = [], 0
+    while offset < len(raw):
+        end = raw.find(b"\n", offset)
+        if end < 0:
+            break
+        line = raw[offset:end]
+        crc, _, body = line.partition(b" ")
+        try:
+            if int(crc, 16) != zlib.crc32(body):
+                break
+            records.append(json.loads(body))
+        except ValueError:
+            break
+        offset = end + 1
+    return records, offset
+
+
+def _row(record):
+    return {k: v for k, v in record.items() if k != "seq"}
+
+
+def journal_path(data_file):
+    return data_file + ".journal"
+
+
+class AppendJournal:
+    """Crash-safe write-ahead journal in front of a session store.
+
+    Each record is one "<crc32> <json>" line written with a single O_APPEND
+    write and fsync'd. compact() moves all pending records into the store in
+    one append_many batch and then empties the journal; recover() truncates a
+    torn tail left by a crash mid-write. Records carry a sequence number and
+    the last compacted one is kept in a side file, so a crash after the
+    journal is emptied cannot replay a batch. A crash after the store write
+    but before that mark is covered by the store: SQLite commits the seq in
+    the batch's own transaction, frame stores note it in .inflight first,
+    and records up to that seq are looked up in the store before replaying.
+
+    The store is only touched by compact(), which readers call before they
+    query it (every dashboard rerun, API reads, cli.py summary); append()
+    never compacts, so writers that must not load pandas (the CLI) can pass
+    store=None.
+    """
+
+    def __init__(self, path, store):
+        self.path = path
+        self.store = store
+        self.lock_path = path + ".lock"
+        self.mark_path = path + ".mark"
+        # Last seq of a batch being written to a non-transactional store; gone once marked
+        self.inflight_path = path + ".inflight"
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return b""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    @staticmethod
+    def _read_seq(path):
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+
+    @staticmethod
+    def _write_seq(path, seq):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(seq))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _last_compacted(self):
+        return self._read_seq(self.mark_path)
+
+    def _write_mark(self, seq):
+        self._write_seq(self.mark_path, seq)
+
+    def _store_seq(self):
+        return (self.store.journal_seq() or 0) if self.store is not None else 0
+
+    def _unstored(self, records):
+        """Pending records a crashed compaction did not already put in the store.
+
+        Records up to the store's journal seq (SQLite) or the .inflight seq
+        (frame stores) may have landed. They are looked up by content rather
+        than dropped on their seq: numbering restarts if .mark is lost.
+        """
+        stored_seq = self.store.journal_seq()
+        covered = stored_seq if stored_seq is not None else self._read_seq(self.inflight_path)
+        maybe = [r for r in records if r["seq"] <= covered]
+        if not maybe:
+            return records
+        mask = self.store.stored_mask([_row(r) for r in maybe])
+        return [r for r, stored in zip(maybe, mask) if not stored] + [r for r in records if r["seq"] > covered]
+
+    def recover(self):
+        """Truncate any torn/corrupt tail, of the journal and of the store. Returns the number of bytes dropped."""
+        with _locked(self.lock_path):
+            raw = self._read()
+            _, valid = _scan(raw)
+            if valid < len(raw):
+                with open(self.path, "r+b") as f:
+                    f.truncate(valid)
+                    f.flush()
+                    os.fsync(f.fileno())
+            # A crash mid-compaction can leave a torn row in the store too (CSV)
+            store_dropped = self.store.recover() if self.store is not None else 0
+            return len(raw) - valid + store_dropped
+
+    def pending(self):
+        records, _ = _scan(self._read())
+        last = self._last_compacted()
+        return [r for r in records if r["seq"] > last]
+
+    def append(self, record):
+        """Durably journal one session; it reaches the store at the next compact()."""
+        row = dict(record)
+        with _locked(self.lock_path):
+            records, valid = _scan(self._read())
+            # The store's seq survives a db copied or restored without its .mark sidecar
+            last_seq = records[-1]["seq"] if records else max(self._last_compacted(), self._store_seq())
+            row["seq"] = last_seq + 1
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, _frame(json.dumps(row, ensure_ascii=False, default=_encode)))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def compact(self):
+        """Move pending records into the store in one batch. Returns how many were moved."""
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return 0
+        with _locked(self.lock_path):
+            # The previous batch may have died mid-write; never append after a torn row
+            self.store.recover()
+            pending = self.pending()
+            records = self._unstored(pending) if pending else []
+            if records:
+                last = pending[-1]["seq"]
+                # 时间列已是 ISO 文本键，各后端 append_many 都能直接解析
+                rows = [_row(r) for r in records]
+                if self.store.journal_seq() is not None:
+                    self.store.append_many(rows, journal_seq=max(last, self._store_seq()))
+                else:
+                    self._write_seq(self.inflight_path, last)
+                    self.store.append_many(rows)
+            if pending:
+                self._write_mark(pending[-1]["seq"])
+            if os.path.exists(self.inflight_path):
+                os.remove(self.inflight_path)
+            if os.path.exists(self.path):
+                with open(self.path, "r+b") as f:
+                    f.truncate(0)
+                    f.flush()
+                    os.fsync(f.fileno())
+            return len(records)
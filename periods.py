@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from storage import slice_sorted
+
+PERIODS = ["Today", "Week", "Month", "Year"]
+
+
+def period_window(period, anchor):
+    """Return [start, end) of the Today/Week/Month/Year window containing anchor (a date or datetime)."""
+    day = datetime(anchor.year, anchor.month, anchor.day)
+    if period == "Today":
+        return day, day + timedelta(days=1)
+    if period == "Week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(weeks=1)
+    if period == "Month":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    start = day.replace(month=1, day=1)
+    return start, start.replace(year=start.year + 1)
+
+
+def previous_window(period, start):
+    return period_window(period, start - timedelta(days=1))
+
+
+def rollup_period_slices(store, period, anchor):
+    """Current and comparison rollup windows: one sorted range read, two binary-search slices."""
+    curr_start, curr_end = period_window(period, anchor)
+    prev_start, prev_end = previous_window(period, curr_start)
+    span = store.rollup(prev_start, curr_end)
+    return (
+        slice_sorted(span, "day", curr_start.date().isoformat(), curr_end.date().isoformat()),
+        slice_sorted(span, "day", prev_start.date().isoformat(), prev_end.date().isoformat()),
+    )
+
+
+def summarize_rollup(roll, days, value_column="duration_minutes"):
+    """Totals and averages of one window of rollup rows spanning `days` days."""
+    minutes = float(roll[value_column].sum())
+    sessions = int(roll["sessions"].sum())
+    by_parent = roll.groupby("parent_subject", observed=True)[value_column].sum()
+    return {
+        "minutes": minutes,
+        "hours": minutes / 60,
+        "sessions": sessions,
+        "active_subjects": int(roll["parent_subject"].nunique()),
+        "active_days": int(roll["day"].nunique()),
+        "avg_focus": float(roll["focus_sum"].sum()) / sessions if sessions else 0.0,
+        "avg_session_minutes": minutes / sessions if sessions else 0.0,
+        "daily_hours": minutes / 60 / max(1, days),
+        "top_subject": by_parent.idxmax() if not by_parent.empty else None,
+    }
+
+
+def growth_pct(current, previous):
+    return ((current - previous) / previous) * 100 if previous > 0 else (100 if current > 0 else 0)
+
+
+def compare_periods(store, period, anchor):
+    """Current vs previous window for any granularity and anchor, from one rollup read.
+
+    The current window's daily average only counts days up to the anchor, so
+    a half-elapsed week is not diluted by days that have not happened yet.
+    """
+    curr_start, curr_end = period_window(period, anchor)
+    prev_start, prev_end = previous_window(period, curr_start)
+    curr_roll, prev_roll = rollup_period_slices(store, period, anchor)
+    elapsed_end = min(curr_end, period_window("Today", anchor)[1])
+    current = summarize_rollup(curr_roll, (elapsed_end - curr_start).days)
+    previous = summarize_rollup(prev_roll, (prev_end - prev_start).days)
+    return {
+        "period": period,
+        "window": (curr_start, curr_end),
+        "previous_window": (prev_start, prev_end),
+        "current": current,
+        "previous": previous,
+        "growth_pct": growth_pct(current["hours"], previous["hours"]),
+        "current_roll": curr_roll,
+        "previous_roll": prev_roll,
+    }
+
+
+def custom_windows(first_day, last_day):
+    """[start, end) of an inclusive day range and of the equally long range right before it."""
+    start = datetime(first_day.year, first_day.month, first_day.day)
+    end = datetime(last_day.year, last_day.month, last_day.day) + timedelta(days=1)
+    return (start, end), (start - (end - start), start)
+
+
+def _prefix(values):
+    return np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+
+def build_day_index(store, start=None, end=None, value_column="duration_minutes"):
+    """Prefix sums of the rollup per day, and per day x (subject, task) pair.
+
+    Row i of every array is the total of all days before first + i, so any
+    [start, end) range costs two lookups (cum[hi] - cum[lo]) however long it
+    is. Built from one rollup read of [start, end), the whole history by
+    default; days outside that span read as zero. Rebuild it when the log
+    changes. Only stores with a persisted rollup make the default cheap.
+    """
+    keys = ["parent_subject", "child_subject"]
+    roll = store.rollup(start, end)
+    if roll.empty:
+        pairs = pd.DataFrame({key: pd.Series(dtype=roll[key].dtype) for key in keys})
+        zeros = np.zeros(1)
+        return {"first": None, "days": 0, "pairs": pairs, "parent_codes": np.zeros(0, dtype=int), "parents": (),
+                "minutes": np.zeros((1, 0)), "day_minutes": zeros, "sessions": zeros, "focus_sum": zeros,
+                "active_days": zeros, "rows": 0}
+    days = pd.to_datetime(roll["day"]).to_numpy().astype("datetime64[D]")
+    first = days.min()
+    slot = (days - first).astype(int)
+    n_days = int(slot.max()) + 1
+    # sort=False numbers pairs in order of first appearance, the order drop_duplicates keeps
+    pair_codes = roll.groupby(keys, sort=False, observed=True).ngroup().to_numpy()
+    pairs = roll[keys].drop_duplicates().reset_index(drop=True)
+    parent_codes, parents = pd.factorize(pairs["parent_subject"].astype(object))
+
+    minutes = np.zeros((n_days, len(pairs)))
+    np.add.at(minutes, (slot, pair_codes), roll[value_column].to_numpy(dtype=float))
+    sessions = np.bincount(slot, weights=roll["sessions"].to_numpy(dtype=float), minlength=n_days)
+    return {
+        "first": first.astype(object),
+        "days": n_days,
+        "pairs": pairs,
+        "parent_codes": parent_codes,
+        "parents": tuple(parents),
+        "minutes": _prefix(minutes),
+        "day_minutes": _prefix(minutes.sum(axis=1)),
+        "sessions": _prefix(sessions),
+        "focus_sum": _prefix(np.bincount(slot, weights=roll["focus_sum"].to_numpy(dtype=float), minlength=n_days)),
+        "active_days": _prefix((sessions > 0).astype(float)),
+        "rows": len(roll),
+    }
+
+
+def _as_date(moment):
+    return moment.date() if isinstance(moment, datetime) else moment
+
+
+def _slots(index, start, end):
+    """Prefix-array rows of a [start, end) day range, clamped to the logged span."""
+    if index["first"] is None:
+        return 0, 0
+    return tuple(min(max((_as_date(m) - index["first"]).days, 0), index["days"]) for m in (start, end))
+
+
+def range_summary(index, start, end, days=None):
+    """summarize_rollup() of [start, end) from the day index: a handful of lookups, no scan."""
+    lo, hi = _slots(index, start, end)
+    minutes = float(index["day_minutes"][hi] - index["day_minutes"][lo])
+    sessions = int(round(index["sessions"][hi] - index["sessions"][lo]))
+    by_parent = np.bincount(index["parent_codes"], weights=index["minutes"][hi] - index["minutes"][lo],
+                            minlength=len(index["parents"]))
+    active = by_parent > 1e-9
+    if days is None:
+        days = (_as_date(end) - _as_date(start)).days
+    return {
+        "minutes": minutes,
+        "hours": minutes / 60,
+        "sessions": sessions,
+        "active_subjects": int(active.sum()),
+        "active_days": int(round(index["active_days"][hi] - index["active_days"][lo])),
+        "avg_focus": float(index["focus_sum"][hi] - index["focus_sum"][lo]) / sessions if sessions else 0.0,
+        "avg_session_minutes": minutes / sessions if sessions else 0.0,
+        "daily_hours": minutes / 60 / max(1, days),
+        "top_subject": index["parents"][int(by_parent.argmax())] if active.any() else None,
+    }
+
+
+def range_roll(index, start, end, value_column="duration_minutes"):
+    """Minutes per (subject, task) pair in [start, end), shaped like rollup rows for subject_totals()."""
+    lo, hi = _slots(index, start, end)
+    minutes = index["minutes"][hi] - index["minutes"][lo]
+    logged = minutes > 1e-9
+    roll = index["pairs"][logged].reset_index(drop=True)
+    roll[value_column] = minutes[logged]
+    return roll
+
+
+def compare_ranges(index, window, previous, anchor, period="Custom"):
+    """compare_periods() for any pair of day ranges, answered from the day index.
+
+    The current range's daily average only counts days up to the anchor,
+    the same rule compare_periods() applies.
+    """
+    curr_start, curr_end = window
+    prev_start, prev_end = previous
+    elapsed_end = max(curr_start, min(curr_end, period_window("Today", anchor)[1]))
+    current = range_summary(index, curr_start, curr_end, (elapsed_end - curr_start).days)
+    previous_summary = range_summary(index, prev_start, prev_end)
+    return {
+        "period": period,
+        "window": window,
+        "previous_window": previous,
+        "current": current,
+        "previous": previous_summary,
+        "growth_pct": growth_pct(current["hours"], previous_summary["hours"]),
+        "current_roll": range_roll(index, curr_start, curr_end),
+        "previous_roll": range_roll(index, prev_start, prev_end),
+    }
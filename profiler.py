@@ -0,0 +1,82 @@
+import json
+import os
+import time
+from datetime import datetime
+
+
+class RerunProfiler:
+    """Opt-in wall time, rows scanned and bytes sent per script section for one rerun.
+
+    Bytes are counted by wrapping the script run context's message queue, so
+    they are the serialized ForwardMsg sizes actually handed to the websocket.
+    """
+
+    def __init__(self, enabled, metrics_file="profile_metrics.jsonl"):
+        self.enabled = enabled
+        self.metrics_file = metrics_file
+        self.sections = []
+        self._current = None
+        self._run_start = time.perf_counter()
+        self._hook_enqueue()
+
+    def _hook_enqueue(self):
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+        except ImportError:
+            return
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return
+        # The context is reused across reruns; always wrap the original callback once
+        original = getattr(ctx, "_profiler_original_enqueue", None)
+        if original is None:
+            original = ctx._enqueue
+            ctx._profiler_original_enqueue = original
+        if not self.enabled:
+            ctx._enqueue = original
+            return
+
+        def counting_enqueue(msg):
+            if self._current is not None:
+                self._current["bytes_sent"] += msg.ByteSize()
+            original(msg)
+
+        ctx._enqueue = counting_enqueue
+
+    def _close(self, now):
+        if self._current is not None:
+            self._current["ms"] = round((now - self._current.pop("_start")) * 1000, 2)
+            self.sections.append(self._current)
+            self._current = None
+
+    def section(self, name):
+        """Close the running section and start timing `name`."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._close(now)
+        self._current = {"section": name, "_start": now, "rows_scanned": 0, "bytes_sent": 0}
+
+    def rows(self, n):
+        if self.enabled and self._current is not None:
+            self._current["rows_scanned"] += int(n)
+
+    def finish(self):
+        """Close the last section and append this rerun to the JSONL metrics file."""
+        if not self.enabled:
+            return []
+        now = time.perf_counter()
+        self._close(now)
+        record = {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "total_ms": round((now - self._run_start) * 1000, 2),
+            "sections": self.sections,
+        }
+        with open(self.metrics_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return self.sections
+
+
+def profiling_requested(query_params):
+    """?profile=1 in the URL or FOCUS_PROFILE=1 in the environment."""
+    return query_params.get("profile") == "1" or os.environ.get("FOCUS_PROFILE") == "1"
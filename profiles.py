@@ -0,0 +1,84 @@
+"""Per-user profiles for a shared host.
+
+Every user gets a directory profiles/<slug>/ holding their own session
+store, append journal and subjects.json, so each user's aggregations only
+ever open their own partition. The default profile keeps the original
+top-level files, so single-user installs carry on unchanged.
+"""
+import os
+import re
+import threading
+
+import datacache
+
+PROFILE_DIR = "profiles"
+DEFAULT_PROFILE = "default"
+LEADERBOARD_SIZE = 10
+
+_UNSAFE = re.compile(r"[^a-z0-9_-]+")
+
+# Leaderboard totals live outside datacache: one slot per (data file, period)
+# holding (anchor day, file signature, totals). Hundreds of profiles would
+# otherwise cycle through its LRU and evict every tab's own entries.
+_board_lock = threading.Lock()
+_board_totals = {}
+
+
+def profile_slug(name):
+    """Filesystem-safe profile id from a login name or ?user= value."""
+    slug = _UNSAFE.sub("-", (name or "").strip().lower()).strip("-")[:40]
+    return slug or DEFAULT_PROFILE
+
+
+def profile_paths(user, data_name, config_name):
+    """(data file, config file) for a profile."""
+    if user == DEFAULT_PROFILE:
+        return data_name, config_name
+    root = os.path.join(PROFILE_DIR, user)
+    return os.path.join(root, os.path.basename(data_name)), os.path.join(root, config_name)
+
+
+def list_profiles():
+    users = [DEFAULT_PROFILE]
+    if os.path.isdir(PROFILE_DIR):
+        users += sorted(e.name for e in os.scandir(PROFILE_DIR) if e.is_dir() and e.name != DEFAULT_PROFILE)
+    return users
+
+
+def _period_totals(path, start, end):
+    """Minutes and sessions for one user, read from that user's daily rollup."""
+    # 延迟导入: CLI 只用到路径函数, 不应为此加载 pandas
+    from storage import open_store
+
+    store = open_store(path)
+    roll = store.rollup(start, end)
+    return float(roll[store.value_column].sum()), int(roll["sessions"].sum())
+
+
+def leaderboard(period, anchor, data_name):
+    """[(user, hours, sessions)] for the period window containing anchor, best first.
+
+    Each user's totals come from their rollup and are cached until their data
+    file changes, so a rerun only re-reads the partitions that were written to.
+    """
+    from periods import period_window
+
+    start, end = period_window(period, anchor)
+    rows = []
+    for user in list_profiles():
+        path, _ = profile_paths(user, data_name, "")
+        if not os.path.exists(path):
+            continue
+        stamp = (anchor.date(), datacache.file_signature(path))
+        with _board_lock:
+            entry = _board_totals.get((path, period))
+        if entry is not None and entry[0] == stamp:
+            minutes, sessions = entry[1]
+        else:
+            minutes, sessions = _period_totals(path, start, end)
+            with _board_lock:
+                _board_totals[(path, period)] = (stamp, (minutes, sessions))
+        if sessions:
+            rows.append((user, minutes / 60, sessions))
+    rows.sort(key=lambda row: row[1], reverse=True)
+    return rows
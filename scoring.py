@@ -0,0 +1,9 @@
+"""Session scoring shared by the dashboard and the CLI (no third-party imports)."""
+
+
+def get_focus_score(minutes):
+    if minutes < 5: return 1
+    elif minutes <= 15: return 2
+    elif minutes <= 30: return 3
+    elif minutes <= 45: return 4
+    else: return 5
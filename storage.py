@@ -0,0 +1,936 @@
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# timestamp: int64 epoch seconds (UTC); utc_offset: seconds east of UTC when the session was logged
+LOG_COLUMNS = ["timestamp", "utc_offset", "parent_subject", "child_subject", "duration_minutes", "focus_score"]
+SUBJECT_COLUMNS = ("parent_subject", "child_subject")
+OFFSET_COLUMN = "utc_offset"
+# Largest |UTC offset|; widens index range scans on the UTC column
+MAX_OFFSET_S = 14 * 3600
+# day x subject rollup: day, <index columns>, <value column>, sessions, focus_sum
+ROLLUP_TABLE = "daily_rollup"
+# key/value rows written in the same transaction as appends, e.g. the last compacted journal seq
+META_TABLE = "meta"
+
+# Back-dated parts a closed Parquet month collects before it is folded into one file again
+LATE_PARTS_MAX = 8
+# Written once every month of a ParquetStore carries the UTC offset column
+OFFSET_MARKER = "epoch-offset.done"
+
+# Bytes just before the last parsed offset; if they change, the file was rewritten
+FINGERPRINT_BYTES = 256
+
+# Parsed frames kept per server process, shared by all profiles; least recently used dropped first
+TAIL_CACHE_MAX = 16
+# Parquet months: the this-and-last-year window of several profiles, or one long history
+MONTH_CACHE_MAX = 96
+
+
+class _LruCache:
+    """Thread-safe, size-bounded dict for the parsed frame caches."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.limit:
+                self._items.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# path -> {"offset", "fingerprint", "columns", "frame"}
+_tail_cache = _LruCache(TAIL_CACHE_MAX)
+# path -> lock held across a whole check-parse-update of that path's entry
+_tail_locks = {}
+_tail_locks_guard = threading.Lock()
+
+
+def _tail_lock(path):
+    with _tail_locks_guard:
+        return _tail_locks.setdefault(path, threading.Lock())
+
+
+def _read_fingerprint(f, offset):
+    start = max(0, offset - FINGERPRINT_BYTES)
+    f.seek(start)
+    return f.read(offset - start)
+
+
+def _parse_rows(raw, columns, header, time_column, offset_column, categorical=()):
+    if not raw.strip():
+        return pd.DataFrame(columns=columns)
+    # Subject IDs parse straight to categoricals; recoding to the shared table then only touches the categories
+    dtype = {col: "category" for col in categorical}
+    if header:
+        frame = pd.read_csv(io.BytesIO(raw), encoding="utf-8", dtype=dtype)
+    else:
+        frame = pd.read_csv(io.BytesIO(raw), header=None, names=columns, encoding="utf-8", dtype=dtype)
+    if offset_column in frame.columns:
+        frame[time_column] = wall_clock(frame[time_column], frame[offset_column])
+    else:
+        frame[time_column] = pd.to_datetime(frame[time_column], format="ISO8601")
+    return frame
+
+
+def _sort_by_time(frame, time_column):
+    # Appends are almost always in order, so this is usually a cheap monotonic check
+    if frame[time_column].is_monotonic_increasing:
+        return frame
+    return frame.sort_values(time_column, kind="stable", ignore_index=True)
+
+
+def slice_sorted(frame, column, start=None, end=None):
+    """Zero-copy [start, end) slice of a frame sorted by column, found by binary search."""
+    values = frame[column].to_numpy()
+    if start is not None and values.dtype.kind == "M":
+        start = pd.Timestamp(start).to_datetime64()
+    if end is not None and values.dtype.kind == "M":
+        end = pd.Timestamp(end).to_datetime64()
+    lo = 0 if start is None else values.searchsorted(start, side="left")
+    hi = len(values) if end is None else values.searchsorted(end, side="left")
+    return frame.iloc[lo:hi]
+
+
+def subject_dtype(codes):
+    """Categorical dtype over a subject code table (see subjects.subject_codes)."""
+    return None if codes is None else pd.CategoricalDtype(list(codes))
+
+
+def encode_subjects(frame, columns, dtype):
+    """Subject columns as categoricals sharing one code table; IDs missing from it are appended.
+
+    Both columns get the same dtype, so parent and child codes index the same
+    table and group-bys/filters compare small integers instead of strings.
+    """
+    columns = [c for c in columns if c in frame.columns]
+    if dtype is None or all(frame[c].dtype == dtype for c in columns):
+        return frame
+    known = set(dtype.categories)
+    extra = set()
+    for col in columns:
+        values = frame[col]
+        seen = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else pd.unique(values.dropna())
+        extra.update(v for v in seen if v not in known)
+    if extra:
+        dtype = pd.CategoricalDtype(list(dtype.categories) + sorted(extra, key=str))
+    return frame.assign(**{col: frame[col].astype(dtype) for col in columns})
+
+
+def _full_load(path, columns, time_column, offset_column, subject_columns, dtype):
+    with open(path, "rb") as f:
+        raw = f.read()
+        # Only parse complete lines; a half-written tail is picked up next time
+        offset = raw.rfind(b"\n") + 1
+        categorical = subject_columns if dtype is not None else ()
+        frame = _sort_by_time(_parse_rows(raw[:offset], columns, True, time_column, offset_column, categorical),
+                              time_column)
+        fingerprint = _read_fingerprint(f, offset)
+    frame = encode_subjects(frame, subject_columns, dtype)
+    _tail_cache[path] = {
+        "offset": offset,
+        "fingerprint": fingerprint,
+        "columns": list(frame.columns),
+        "frame": frame,
+        "dtype": dtype,
+    }
+    return frame
+
+
+def load_logs(path, columns=LOG_COLUMNS, time_column="timestamp", offset_column=OFFSET_COLUMN,
+              subject_columns=SUBJECT_COLUMNS, dtype=None):
+    """Load the session log, parsing only rows appended since the previous call.
+
+    The returned frame is sorted by local wall-clock time, shared between
+    calls and must be treated as read-only. Epoch logs (with offset_column)
+    are converted arithmetically; older ISO text logs are parsed. With a
+    subject dtype the subject columns are categorical; only new rows are encoded.
+    Concurrent callers (sessions, API threads) take turns per path, so a new
+    tail is parsed and appended exactly once.
+    """
+    with _tail_lock(path):
+        return _load_tail(path, columns, time_column, offset_column, subject_columns, dtype)
+
+
+def _load_tail(path, columns, time_column, offset_column, subject_columns, dtype):
+    cached = _tail_cache.get(path)
+    if cached is None:
+        return _full_load(path, columns, time_column, offset_column, subject_columns, dtype)
+    if cached["dtype"] != dtype:
+        # Code table changed (subjects.json saved): recode the cached frame, no re-parse
+        cached.update(frame=encode_subjects(cached["frame"], subject_columns, dtype), dtype=dtype)
+
+    size = os.path.getsize(path)
+    offset = cached["offset"]
+    if size < offset:
+        return _full_load(path, columns, time_column, offset_column, subject_columns, dtype)
+    if size == offset:
+        with open(path, "rb") as f:
+            if _read_fingerprint(f, offset) != cached["fingerprint"]:
+                return _full_load(path, columns, time_column, offset_column, subject_columns, dtype)
+        return cached["frame"]
+
+    with open(path, "rb") as f:
+        # Rewritten in place (e.g. a relabel migration) with the same or larger size
+        if _read_fingerprint(f, offset) != cached["fingerprint"]:
+            return _full_load(path, columns, time_column, offset_column, subject_columns, dtype)
+        f.seek(offset)
+        chunk = f.read(size - offset)
+        complete = chunk.rfind(b"\n") + 1
+        if complete == 0:
+            return cached["frame"]
+        new_rows = _parse_rows(chunk[:complete], cached["columns"], False, time_column, offset_column,
+                               subject_columns if dtype is not None else ())
+        new_offset = offset + complete
+        fingerprint = _read_fingerprint(f, new_offset)
+
+    frame = cached["frame"]
+    if not new_rows.empty:
+        table = dtype
+        if dtype is not None and not frame.empty:
+            # Encode against the cached table, which may have been widened by unknown IDs
+            table = next((frame[c].dtype for c in subject_columns if c in frame.columns), dtype)
+        new_rows = encode_subjects(new_rows, subject_columns, table)
+        frame = new_rows if frame.empty else pd.concat([frame, new_rows], ignore_index=True)
+        # An unseen ID widened the new rows' table and concat fell back to strings
+        frame = encode_subjects(_sort_by_time(frame, time_column), subject_columns, table)
+    cached.update(offset=new_offset, fingerprint=fingerprint, frame=frame)
+    return frame
+
+
+def invalidate(path):
+    """Drop the cached frame so the next load re-reads the whole file."""
+    with _tail_lock(path):
+        _tail_cache.pop(path, None)
+
+
+# ==========================================
+# Pluggable session stores
+# ==========================================
+def _time_key(value):
+    """Sortable text key for ISO-text schemas (no offset column); ranges compare lexically."""
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _day_key(value):
+    return _time_key(value)[:10]
+
+
+def _local_offset(naive):
+    """UTC offset in seconds of a naive local wall-clock datetime."""
+    return int(naive.astimezone().utcoffset().total_seconds())
+
+
+def to_epoch(value):
+    """(epoch seconds, UTC offset seconds) for a datetime, date or ISO string; naive values are local time."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    aware = value if value.tzinfo is not None else value.astimezone()
+    return int(aware.timestamp() // 1), int(aware.utcoffset().total_seconds())
+
+
+def epoch_columns(stamps):
+    """Vectorised to_epoch for naive local times (ISO text or datetimes); offsets are looked up once per distinct hour."""
+    wall = pd.to_datetime(pd.Series(stamps), format="ISO8601").reset_index(drop=True)
+    codes, hours = pd.factorize(wall.dt.floor("h"))
+    offsets = np.array([_local_offset(h.to_pydatetime()) for h in hours], dtype="int64")[codes]
+    seconds = wall.to_numpy().astype("datetime64[s]").astype("int64")
+    return seconds - offsets, offsets
+
+
+def wall_clock(epoch, offset):
+    """datetime64[s] local wall-clock times from epoch seconds and UTC offsets, without any parsing."""
+    return (np.asarray(epoch, dtype="int64") + np.asarray(offset, dtype="int64")).astype("datetime64[s]")
+
+
+def _wall_seconds(value):
+    """A naive bound (datetime, date or 'YYYY-MM-DD') as seconds comparable to epoch + offset."""
+    return pd.Timestamp(value).value // 10**9
+
+
+def _epoch_pair(row, time_column, offset_column):
+    """Epoch/offset for a record; rows that already carry both (imports, migrations) pass through."""
+    value, offset = row.get(time_column), row.get(offset_column)
+    if isinstance(value, (int, np.integer)) and offset is not None and not pd.isna(offset):
+        return int(value), int(offset)
+    return to_epoch(value)
+
+
+def _wall_day(seconds):
+    return (datetime(1970, 1, 1) + timedelta(seconds=seconds)).date().isoformat()
+
+
+def _stored_mask(store, records):
+    """Which records are already in the store, matching duplicates one for one.
+
+    Used to replay a journal batch whose append may or may not have landed
+    before a crash; only the batch's own time span is read.
+    """
+    if not records:
+        return []
+    rows = pd.DataFrame(list(records), columns=store.columns)
+    if store.offset_column:
+        epoch, offset = zip(*(_epoch_pair(row, store.time_column, store.offset_column)
+                              for row in rows.to_dict("records")))
+        rows[store.offset_column] = np.asarray(offset, dtype="int64")
+        rows[store.time_column] = wall_clock(epoch, rows[store.offset_column])
+    else:
+        rows[store.time_column] = pd.to_datetime(rows[store.time_column])
+    times = rows[store.time_column]
+    stored = store.query(times.min(), times.max() + pd.Timedelta(seconds=1))
+
+    def keys(frame):
+        columns = [frame[store.time_column].to_numpy().astype("datetime64[us]").astype("int64")]
+        columns += [frame[c].astype(object).to_numpy() for c in store.columns if c != store.time_column]
+        return zip(*columns)
+
+    available = Counter(keys(stored))
+    mask = []
+    for key in keys(rows):
+        mask.append(available[key] > 0)
+        available[key] -= 1
+    return mask
+
+
+class FrameStore:
+    """Aggregations shared by stores that answer queries from in-memory frames.
+
+    Subclasses provide query(start, end) returning rows sorted by time. The
+    rollup is derived from those rows on read rather than persisted.
+    """
+
+    # rollup() regroups raw rows, so a whole-history rollup costs a full scan
+    persisted_rollup = False
+
+    def __init__(self, path, columns=LOG_COLUMNS, time_column="timestamp",
+                 index_columns=SUBJECT_COLUMNS, value_column="duration_minutes", score_column="focus_score",
+                 offset_column=OFFSET_COLUMN):
+        self.path = path
+        self.columns = list(columns)
+        self.time_column = time_column
+        self.index_columns = tuple(index_columns)
+        self.value_column = value_column
+        self.score_column = score_column
+        # Epoch mode only when the schema has an offset column; otherwise ISO text keys
+        self.offset_column = offset_column if offset_column in self.columns else None
+        self.subject_dtype = None
+
+    def set_subject_codes(self, codes):
+        """Load subject columns as categoricals over this code table (None keeps strings)."""
+        self.subject_dtype = subject_dtype(codes)
+
+    def journal_seq(self):
+        """None: appends here are not transactional, so no journal seq is stored with them."""
+        return None
+
+    def recover(self):
+        """Repair what a crash mid-append can leave behind. Returns the number of bytes dropped."""
+        return 0
+
+    def stored_mask(self, records):
+        return _stored_mask(self, records)
+
+    def load(self):
+        return self.query()
+
+    def totals(self, start=None, end=None, by=SUBJECT_COLUMNS):
+        df = self.query(start, end)
+        by = list(by)
+        if not by:
+            return pd.DataFrame({self.value_column: [df[self.value_column].sum()], "sessions": [len(df)]})
+        grouped = df.groupby(by, observed=True)[self.value_column].agg(["sum", "count"])
+        return grouped.rename(columns={"sum": self.value_column, "count": "sessions"}).reset_index()
+
+    def daily_totals(self, start=None, end=None):
+        df = self.query(start, end)
+        days = df[self.time_column].to_numpy().astype("datetime64[D]")
+        sums = pd.Series(df[self.value_column].to_numpy(), index=days).groupby(level=0).sum()
+        # Format only the distinct days, not every row
+        sums.index = pd.DatetimeIndex(sums.index).strftime("%Y-%m-%d").rename("date_str")
+        return sums
+
+    def first_day(self):
+        df = self.load()
+        return None if df.empty else df[self.time_column].iloc[0].date()
+
+    def rollup(self, start=None, end=None):
+        df = self.query(
+            None if start is None else _day_key(start),
+            None if end is None else _day_key(end),
+        )
+        days = pd.Series(df[self.time_column].to_numpy().astype("datetime64[D]"), index=df.index, name="day")
+        grouped = df.groupby([days] + [df[c] for c in self.index_columns], observed=True).agg(
+            **{self.value_column: (self.value_column, "sum"),
+               "sessions": (self.value_column, "size"),
+               "focus_sum": (self.score_column, "sum")}
+        ).reset_index()
+        grouped["day"] = pd.DatetimeIndex(grouped["day"]).strftime("%Y-%m-%d")
+        return grouped
+
+    def rebuild_rollup(self):
+        pass
+
+    def append(self, record):
+        self.append_many([record])
+
+
+class CsvStore(FrameStore):
+    """Flat CSV log. Range queries are binary-search slices of the tail-loaded frame."""
+
+    def init(self):
+        if not os.path.exists(self.path):
+            pd.DataFrame(columns=self.columns).to_csv(self.path, index=False, encoding="utf-8")
+        elif self.offset_column:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = next(csv.reader([f.readline()]), [])
+            if self.offset_column not in header:
+                self._migrate_epoch()
+
+    def _migrate_epoch(self):
+        """One-time rewrite of an ISO text log to epoch seconds + UTC offset."""
+        df = pd.read_csv(self.path, encoding="utf-8")
+        df[self.time_column], df[self.offset_column] = epoch_columns(df[self.time_column]) if not df.empty else ([], [])
+        df[self.columns].to_csv(self.path, index=False, encoding="utf-8")
+        invalidate(self.path)
+
+    def load(self):
+        return load_logs(self.path, self.columns, self.time_column, self.offset_column,
+                         self.index_columns, self.subject_dtype)
+
+    def query(self, start=None, end=None):
+        return slice_sorted(self.load(), self.time_column, start, end)
+
+    def recover(self):
+        """Truncate a torn last row (no trailing newline) so the next append starts on a fresh line.
+
+        Call with the journal lock held: an append in progress looks the same.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r+b") as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 65536)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b"\n")
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end == size:
+                return 0
+            f.truncate(end)
+            f.flush()
+            os.fsync(f.fileno())
+        invalidate(self.path)
+        return size - end
+
+    def append_many(self, records):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        for record in records:
+            row = dict(record)
+            if self.offset_column:
+                row[self.time_column], row[self.offset_column] = _epoch_pair(row, self.time_column, self.offset_column)
+            else:
+                row[self.time_column] = _time_key(row[self.time_column])
+            writer.writerow([row.get(col) for col in self.columns])
+        # One write per batch keeps a crash to at most one torn tail, which recover() drops
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            f.write(buffer.getvalue())
+
+    def relabel_subjects(self, parent_map, child_map):
+        """Rewrite (parent, child) labels in one pass; child_map is keyed by the old pair."""
+        p_col, c_col = self.index_columns
+        df_temp = pd.read_csv(self.path)
+        if df_temp.empty:
+            return
+        pairs = pd.Series(list(zip(df_temp[p_col], df_temp[c_col])), index=df_temp.index)
+        df_temp[c_col] = pairs.map(child_map).fillna(df_temp[c_col])
+        df_temp[p_col] = df_temp[p_col].map(parent_map).fillna(df_temp[p_col])
+        df_temp.to_csv(self.path, index=False, encoding="utf-8")
+        invalidate(self.path)
+
+
+class SqliteStore:
+    """Session table with indexes on the time and subject columns.
+
+    Period filters and gallery sums are pushed down as indexed range queries,
+    so latency stays flat as the log grows. A day x subject rollup table is
+    updated in the same transaction as every append.
+    """
+
+    # rollup() reads the day x subject table, never the raw sessions
+    persisted_rollup = True
+
+    def __init__(self, path, columns=LOG_COLUMNS, time_column="timestamp",
+                 index_columns=SUBJECT_COLUMNS, value_column="duration_minutes", score_column="focus_score",
+                 offset_column=OFFSET_COLUMN, table="sessions"):
+        self.path = path
+        self.columns = list(columns)
+        self.time_column = time_column
+        self.index_columns = tuple(index_columns)
+        self.value_column = value_column
+        self.score_column = score_column
+        self.offset_column = offset_column if offset_column in self.columns else None
+        self.table = table
+        self.rollup_table = f"{table}_{ROLLUP_TABLE}"
+        self.meta_table = f"{table}_{META_TABLE}"
+        self.subject_dtype = None
+
+    def set_subject_codes(self, codes):
+        """Return subject columns as categoricals over this code table (None keeps strings)."""
+        self.subject_dtype = subject_dtype(codes)
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path))
+
+    def init(self):
+        with self._connect() as conn, conn:
+            cols = ", ".join(f'"{c}"' for c in self.columns)
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" (id INTEGER PRIMARY KEY, {cols})')
+            existing = [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+            migrated = self.offset_column is not None and self.offset_column not in existing
+            if migrated:
+                self._migrate_epoch(conn)
+            for col in (self.time_column,) + self.index_columns:
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.table}_{col}" ON "{self.table}" ("{col}")')
+            has_rollup = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.rollup_table,)
+            ).fetchone()
+            keys = ", ".join(f'"{c}"' for c in self.index_columns)
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.rollup_table}" (day TEXT NOT NULL, '
+                + "".join(f'"{c}" TEXT, ' for c in self.index_columns)
+                + f'"{self.value_column}" REAL NOT NULL DEFAULT 0, sessions INTEGER NOT NULL DEFAULT 0, '
+                f'focus_sum REAL NOT NULL DEFAULT 0, PRIMARY KEY (day, {keys}))'
+            )
+            self._create_meta(conn)
+        if migrated or not has_rollup:
+            self.rebuild_rollup()
+
+    def _create_meta(self, conn):
+        conn.execute(f'CREATE TABLE IF NOT EXISTS "{self.meta_table}" (key TEXT PRIMARY KEY, value INTEGER)')
+
+    def journal_seq(self):
+        """Last journal seq committed together with its sessions (0 before the first compaction)."""
+        with self._connect() as conn:
+            try:
+                row = conn.execute(f'SELECT value FROM "{self.meta_table}" WHERE key = ?', ("journal_seq",)).fetchone()
+            except sqlite3.OperationalError:  # store never initialized with a meta table
+                return 0
+        return 0 if row is None else int(row[0])
+
+    def recover(self):
+        """Nothing to repair: every append is one transaction."""
+        return 0
+
+    def stored_mask(self, records):
+        return _stored_mask(self, records)
+
+    def _migrate_epoch(self, conn):
+        """One-time rewrite of ISO text timestamps to epoch seconds + UTC offset."""
+        conn.execute(f'ALTER TABLE "{self.table}" ADD COLUMN "{self.offset_column}" INTEGER')
+        rows = conn.execute(f'SELECT id, "{self.time_column}" FROM "{self.table}"').fetchall()
+        if not rows:
+            return
+        ids, stamps = zip(*rows)
+        epoch, offset = epoch_columns(list(stamps))
+        conn.executemany(
+            f'UPDATE "{self.table}" SET "{self.time_column}" = ?, "{self.offset_column}" = ? WHERE id = ?',
+            zip(epoch.tolist(), offset.tolist(), ids),
+        )
+
+    def _local_time(self):
+        """SQL expression for local wall-clock seconds (epoch mode)."""
+        return f'("{self.time_column}" + "{self.offset_column}")'
+
+    def _where(self, start, end):
+        if self.offset_column:
+            # The UTC column is indexed; the window is on local time, which is at most MAX_OFFSET_S away
+            clauses, params = [], []
+            if start is not None:
+                clauses += [f'"{self.time_column}" >= ?', f"{self._local_time()} >= ?"]
+                params += [_wall_seconds(start) - MAX_OFFSET_S, _wall_seconds(start)]
+            if end is not None:
+                clauses += [f'"{self.time_column}" < ?', f"{self._local_time()} < ?"]
+                params += [_wall_seconds(end) + MAX_OFFSET_S, _wall_seconds(end)]
+            return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+        clauses, params = [], []
+        if start is not None:
+            clauses.append(f'"{self.time_column}" >= ?')
+            params.append(_time_key(start))
+        if end is not None:
+            clauses.append(f'"{self.time_column}" < ?')
+            params.append(_time_key(end))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def _read(self, sql, params):
+        with self._connect() as conn:
+            df = pd.read_sql_query(sql, conn, params=params)
+        return encode_subjects(df, self.index_columns, self.subject_dtype)
+
+    def load(self):
+        return self.query()
+
+    def query(self, start=None, end=None):
+        where, params = self._where(start, end)
+        cols = ", ".join(f'"{c}"' for c in self.columns)
+        if self.offset_column:
+            df = self._read(f'SELECT {cols} FROM "{self.table}"{where} ORDER BY {self._local_time()}', params)
+            df[self.time_column] = wall_clock(df[self.time_column], df[self.offset_column])
+            return df
+        df = self._read(f'SELECT {cols} FROM "{self.table}"{where} ORDER BY "{self.time_column}"', params)
+        df[self.time_column] = pd.to_datetime(df[self.time_column], format="ISO8601")
+        return df
+
+    def totals(self, start=None, end=None, by=SUBJECT_COLUMNS):
+        where, params = self._where(start, end)
+        by = list(by)
+        keys = ", ".join(f'"{c}"' for c in by)
+        select = (keys + ", ") if by else ""
+        group = f" GROUP BY {keys}" if by else ""
+        sql = (f'SELECT {select}COALESCE(SUM("{self.value_column}"), 0) AS "{self.value_column}", '
+               f'COUNT(*) AS sessions FROM "{self.table}"{where}{group}')
+        return self._read(sql, params)
+
+    def _day_where(self, start, end):
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(_day_key(start))
+        if end is not None:
+            clauses.append("day < ?")
+            params.append(_day_key(end))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def daily_totals(self, start=None, end=None):
+        where, params = self._day_where(start, end)
+        sql = (f'SELECT day AS date_str, SUM("{self.value_column}") AS "{self.value_column}" '
+               f'FROM "{self.rollup_table}"{where} GROUP BY day')
+        return self._read(sql, params).set_index("date_str")[self.value_column]
+
+    def first_day(self):
+        with self._connect() as conn:
+            day = conn.execute(f'SELECT MIN(day) FROM "{self.rollup_table}"').fetchone()[0]
+        return None if day is None else date.fromisoformat(day)
+
+    def rollup(self, start=None, end=None):
+        """Day x subject rows for whole days in [start, end)."""
+        where, params = self._day_where(start, end)
+        return self._read(f'SELECT * FROM "{self.rollup_table}"{where} ORDER BY day', params)
+
+    def rebuild_rollup(self):
+        """Recompute the rollup table from the raw session log."""
+        keys = ", ".join(f'"{c}"' for c in self.index_columns)
+        day = (f"date({self._local_time()}, 'unixepoch')" if self.offset_column
+               else f'substr("{self.time_column}", 1, 10)')
+        with self._connect() as conn, conn:
+            conn.execute(f'DELETE FROM "{self.rollup_table}"')
+            conn.execute(
+                f'INSERT INTO "{self.rollup_table}" '
+                f'SELECT {day} AS day, {keys}, '
+                f'COALESCE(SUM("{self.value_column}"), 0), COUNT(*), COALESCE(SUM("{self.score_column}"), 0) '
+                f'FROM "{self.table}" GROUP BY day, {keys}'
+            )
+
+    def append(self, record):
+        self.append_many([record])
+
+    def append_many(self, records, journal_seq=None):
+        """Insert sessions and their rollup deltas in one transaction.
+
+        journal_seq, when given, is recorded in the meta table in that same
+        transaction, so a journal batch and its compaction mark commit together.
+        """
+        cols = ", ".join(f'"{c}"' for c in self.columns)
+        marks = ", ".join("?" for _ in self.columns)
+        keys = ", ".join(f'"{c}"' for c in self.index_columns)
+        rows, deltas = [], {}
+        for record in records:
+            row = dict(record)
+            if self.offset_column:
+                row[self.time_column], row[self.offset_column] = _epoch_pair(row, self.time_column, self.offset_column)
+                day = _wall_day(row[self.time_column] + row[self.offset_column])
+            else:
+                row[self.time_column] = _time_key(row[self.time_column])
+                day = row[self.time_column][:10]
+            values = [None if pd.isna(row.get(c)) else row.get(c) for c in self.columns]
+            rows.append(values)
+            row = dict(zip(self.columns, values))
+            key = (day,) + tuple(row[c] for c in self.index_columns)
+            minutes, sessions, focus = deltas.get(key, (0.0, 0, 0.0))
+            deltas[key] = (minutes + (row[self.value_column] or 0), sessions + 1, focus + (row[self.score_column] or 0))
+        with self._connect() as conn, conn:
+            conn.executemany(f'INSERT INTO "{self.table}" ({cols}) VALUES ({marks})', rows)
+            conn.executemany(
+                f'INSERT INTO "{self.rollup_table}" (day, {keys}, "{self.value_column}", sessions, focus_sum) '
+                f'VALUES (?, {", ".join("?" for _ in self.index_columns)}, ?, ?, ?) '
+                f'ON CONFLICT (day, {keys}) DO UPDATE SET '
+                f'"{self.value_column}" = "{self.value_column}" + excluded."{self.value_column}", '
+                f'sessions = sessions + excluded.sessions, focus_sum = focus_sum + excluded.focus_sum',
+                [key + delta for key, delta in deltas.items()],
+            )
+            if journal_seq is not None:
+                self._create_meta(conn)
+                conn.execute(f'INSERT OR REPLACE INTO "{self.meta_table}" (key, value) VALUES (?, ?)',
+                             ("journal_seq", int(journal_seq)))
+
+    def relabel_subjects(self, parent_map, child_map):
+        """Rewrite (parent, child) labels in one transaction; child_map is keyed by the old pair."""
+        p_col, c_col = self.index_columns
+        with self._connect() as conn, conn:
+            conn.executemany(
+                f'UPDATE "{self.table}" SET "{c_col}" = ? WHERE "{p_col}" = ? AND "{c_col}" = ?',
+                [(new, parent, child) for (parent, child), new in child_map.items()],
+            )
+            conn.executemany(
+                f'UPDATE "{self.table}" SET "{p_col}" = ? WHERE "{p_col}" = ?',
+                [(new, old) for old, new in parent_map.items()],
+            )
+        self.rebuild_rollup()
+
+
+class ParquetStore(FrameStore):
+    """Columnar archive partitioned as <path>/year=YYYY/month=MM/data.parquet (needs pyarrow).
+
+    Timestamps are stored as int64 epoch seconds plus UTC offset and subject
+    columns are dictionary encoded, so loading does no string parsing. Appends
+    rewrite only the current month; a back-dated session for a closed month
+    goes to an extra late-*.parquet part next to its data.parquet, so closed
+    month files are never rewritten by normal use and stay cached in memory.
+    Range reads open only overlapping months.
+    """
+
+    # (path, year, month) -> (file signature, subject dtype, frame)
+    _month_cache = _LruCache(MONTH_CACHE_MAX)
+
+    def init(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("ParquetStore requires pyarrow (pip install pyarrow)") from exc
+        os.makedirs(self.path, exist_ok=True)
+        marker = os.path.join(self.path, OFFSET_MARKER)
+        if self.offset_column and not os.path.exists(marker):
+            # One-time migration of months written as naive epoch microseconds; the
+            # marker keeps every later init (each dashboard rerun) from opening them all
+            for year, month in self._existing_months():
+                if self.offset_column not in pq.read_schema(self._month_file(year, month)).names:
+                    self._write_month(year, month, self._read_month(year, month))
+            with open(marker, "w", encoding="utf-8"):
+                pass
+
+    def _month_file(self, year, month):
+        return os.path.join(self.path, f"year={year}", f"month={month:02d}", "data.parquet")
+
+    def _month_files(self, year, month):
+        """data.parquet followed by the month's late parts in write order."""
+        month_dir = os.path.dirname(self._month_file(year, month))
+        late = sorted(name for name in os.listdir(month_dir) if name.startswith("late-") and name.endswith(".parquet"))
+        return [self._month_file(year, month)] + [os.path.join(month_dir, name) for name in late]
+
+    def _existing_months(self):
+        months = []
+        if not os.path.isdir(self.path):
+            return months
+        for year_dir in os.scandir(self.path):
+            if not (year_dir.is_dir() and year_dir.name.startswith("year=")):
+                continue
+            for month_dir in os.scandir(year_dir.path):
+                if month_dir.name.startswith("month=") and os.path.exists(os.path.join(month_dir.path, "data.parquet")):
+                    months.append((int(year_dir.name[5:]), int(month_dir.name[6:])))
+        return sorted(months)
+
+    def _months(self, start, end):
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        selected = []
+        for year, month in self._existing_months():
+            month_start = pd.Timestamp(year, month, 1)
+            month_end = month_start + pd.offsets.MonthBegin(1)
+            if (end is None or month_start < end) and (start is None or month_end > start):
+                selected.append((year, month))
+        return selected
+
+    def _read_month(self, year, month):
+        if not os.path.exists(self._month_file(year, month)):
+            return pd.DataFrame(columns=self.columns)
+        key = (self.path, year, month)
+        files = self._month_files(year, month)
+        signature = tuple((file, os.stat(file).st_mtime_ns) for file in files)
+        cached = self._month_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            if cached[1] != self.subject_dtype:
+                cached = self._month_cache[key] = (signature, self.subject_dtype,
+                                                   encode_subjects(cached[2], self.index_columns, self.subject_dtype))
+            return cached[2]
+        frame = pd.read_parquet(files[0])
+        if len(files) > 1:
+            parts = [frame] + [pd.read_parquet(file) for file in files[1:]]
+            frame = pd.concat([part.astype({c: object for c in self.index_columns}) for part in parts], ignore_index=True)
+        if self.offset_column in frame.columns:
+            frame[self.time_column] = wall_clock(frame[self.time_column], frame[self.offset_column])
+        else:
+            frame[self.time_column] = pd.to_datetime(frame[self.time_column], unit="us")
+            if self.offset_column:
+                frame[self.offset_column] = epoch_columns(frame[self.time_column])[1]
+        if len(files) > 1:
+            # Each file is sorted by wall-clock time; late parts interleave with data.parquet
+            frame = frame.sort_values(self.time_column, kind="stable", ignore_index=True)
+        # Per-file dictionaries differ; a shared code table keeps month concats categorical
+        frame = encode_subjects(frame, self.index_columns, self.subject_dtype)
+        self._month_cache[key] = (signature, self.subject_dtype, frame)
+        return frame
+
+    def _write_month(self, year, month, frame):
+        """Rewrite the month as a single data.parquet, folding in any late parts."""
+        file = self._month_file(year, month)
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        late = self._month_files(year, month)[1:]
+        self._write_file(file, frame)
+        for part in late:
+            os.remove(part)
+        self._month_cache.pop((self.path, year, month), None)
+
+    def _write_late(self, year, month, frame):
+        """Add back-dated rows to a closed month as a new part; data.parquet is left as is."""
+        files = self._month_files(year, month)
+        if len(files) > LATE_PARTS_MAX:
+            # Rare: fold the parts back into one file so reads stay a handful of opens
+            current = self._read_month(year, month).astype({c: object for c in self.index_columns})
+            self._write_month(year, month, pd.concat([current, frame], ignore_index=True))
+            return
+        month_dir = os.path.dirname(files[0])
+        self._write_file(os.path.join(month_dir, f"late-{time.time_ns():020d}.parquet"), frame)
+        self._month_cache.pop((self.path, year, month), None)
+
+    def _write_file(self, file, frame):
+        out = frame[self.columns].sort_values(self.time_column, kind="stable", ignore_index=True)
+        if self.offset_column:
+            wall = out[self.time_column].to_numpy().astype("datetime64[s]").astype("int64")
+            out[self.time_column] = wall - out[self.offset_column].to_numpy(dtype="int64")
+        else:
+            out[self.time_column] = pd.to_datetime(out[self.time_column]).astype("datetime64[us]").astype("int64")
+        for col in self.index_columns:
+            out[col] = out[col].astype("category")
+        tmp = file + ".tmp"
+        out.to_parquet(tmp, index=False)
+        os.replace(tmp, file)
+
+    def query(self, start=None, end=None):
+        frames = [self._read_month(y, m) for y, m in self._months(start, end)]
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        # Months share the code table, so this only recodes if one of them carried unknown IDs
+        df = encode_subjects(df, self.index_columns, self.subject_dtype)
+        for col in self.index_columns:
+            if df[col].dtype != "category":
+                df[col] = df[col].astype("category")
+        return slice_sorted(df, self.time_column, start, end)
+
+    def first_day(self):
+        months = self._existing_months()
+        if not months:
+            return None
+        df = self._read_month(*months[0])
+        return None if df.empty else df[self.time_column].iloc[0].date()
+
+    def append_many(self, records):
+        new_rows = pd.DataFrame(list(records), columns=self.columns)
+        if new_rows.empty:
+            return
+        if self.offset_column:
+            times, offsets = new_rows[self.time_column], new_rows[self.offset_column]
+            if not (pd.api.types.is_integer_dtype(times) and offsets.notna().all()):
+                pairs = [_epoch_pair(row, self.time_column, self.offset_column) for row in new_rows.to_dict("records")]
+                times, offsets = zip(*pairs)
+            new_rows[self.offset_column] = np.asarray(offsets, dtype="int64")
+            new_rows[self.time_column] = wall_clock(times, new_rows[self.offset_column])
+        else:
+            new_rows[self.time_column] = pd.to_datetime(new_rows[self.time_column])
+        stamps = new_rows[self.time_column]
+        today = date.today()
+        for (year, month), rows in new_rows.groupby([stamps.dt.year, stamps.dt.month]):
+            closed = (year, month) < (today.year, today.month)
+            if closed and os.path.exists(self._month_file(year, month)):
+                self._write_late(year, month, rows)
+                continue
+            current = self._read_month(year, month)
+            merged = rows if current.empty else pd.concat([current.astype({c: object for c in self.index_columns}), rows], ignore_index=True)
+            self._write_month(year, month, merged)
+
+    def _rewrite_all(self, transform):
+        for year, month in self._existing_months():
+            frame = self._read_month(year, month).astype({c: object for c in self.index_columns})
+            self._write_month(year, month, transform(frame))
+
+    def relabel_subjects(self, parent_map, child_map):
+        p_col, c_col = self.index_columns
+
+        def transform(frame):
+            pairs = pd.Series(list(zip(frame[p_col], frame[c_col])), index=frame.index)
+            frame[c_col] = pairs.map(child_map).fillna(frame[c_col])
+            frame[p_col] = frame[p_col].map(parent_map).fillna(frame[p_col])
+            return frame
+        self._rewrite_all(transform)
+
+
+def open_store(path, **kwargs):
+    """Pick the backend from the file extension (.db/.sqlite -> SQLite, .parquet -> Parquet, otherwise CSV)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".db", ".sqlite", ".sqlite3"):
+        return SqliteStore(path, **kwargs)
+    if ext == ".parquet":
+        return ParquetStore(path, **kwargs)
+    return CsvStore(path, **kwargs)
+
+
+def import_csv(csv_path, store, chunksize=50000):
+    """One-shot import of an existing CSV log into another store."""
+    offset_column = getattr(store, "offset_column", None)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, encoding="utf-8"):
+        if offset_column is None:
+            chunk[store.time_column] = pd.to_datetime(chunk[store.time_column], format="ISO8601")
+        elif offset_column not in chunk.columns:
+            # ISO text log: convert the whole chunk at once instead of per record
+            chunk[store.time_column], chunk[offset_column] = epoch_columns(chunk[store.time_column])
+        store.append_many(chunk.to_dict("records"))
@@ -0,0 +1,223 @@
+"""Stable subject IDs for subjects.json.
+
+The log stores IDs instead of names, so renaming a subject only edits the
+config. Nodes look like {"id": "s3", "target_hours": ..., "children": {...}}
+and nest to any depth; the log keeps the top-level ID in parent_subject and
+the ID of the node a session was logged against in child_subject.
+"""
+from itertools import accumulate
+
+GENERAL_TASK = "General"
+# Display separator of task paths below a subject, e.g. "Algorithms / Graphs"
+TASK_SEP = " / "
+
+
+def iter_nodes(config):
+    """(path, node) for every node in preorder; path is (parent, task, subtask, ...)."""
+    stack = [((name,), node) for name, node in reversed(config["subjects"].items())]
+    while stack:
+        path, node = stack.pop()
+        yield path, node
+        stack.extend((path + (name,), child) for name, child in reversed(node.get("children", {}).items()))
+
+
+def task_path(task):
+    """A task given as a label ("A / B", also "A/B") or a sequence of names, as a tuple."""
+    if task is None:
+        return ()
+    if isinstance(task, str):
+        return tuple(part.strip() for part in task.split("/") if part.strip())
+    return tuple(task)
+
+
+def task_label(path):
+    return TASK_SEP.join(path)
+
+
+def find_node(config, path):
+    """The node at path; raises KeyError if any step is missing."""
+    node = config["subjects"][path[0]]
+    for name in path[1:]:
+        node = node.get("children", {})[name]
+    return node
+
+
+def sibling_map(config, path):
+    """The dict that holds the node at path, for renames and deletes."""
+    return config["subjects"] if len(path) == 1 else find_node(config, path[:-1]).setdefault("children", {})
+
+
+def ensure_subject_ids(config):
+    """Give every node an ID. Returns True if the config changed."""
+    changed = False
+    next_id = config.get("next_subject_id", 1)
+    for _, node in iter_nodes(config):
+        if not node.get("id"):
+            node["id"] = f"s{next_id}"
+            next_id += 1
+            changed = True
+    if config.get("next_subject_id") != next_id:
+        config["next_subject_id"] = next_id
+        changed = True
+    return changed
+
+
+def subject_name_map(config):
+    """ID -> display name, including subjects that were deleted but still appear in the log."""
+    names = dict(config.get("archived_names", {}))
+    for path, node in iter_nodes(config):
+        names[node["id"]] = path[-1]
+    return names
+
+
+def subject_codes(config):
+    """The shared code table for categorical subject columns, in tree order.
+
+    Live nodes come first in preorder, then archived IDs and the "General"
+    placeholder, so a code is stable for as long as the tree is.
+    """
+    codes = [node["id"] for _, node in iter_nodes(config)]
+    seen = set(codes)
+    for sid in list(config.get("archived_names", {})) + [GENERAL_TASK]:
+        if sid not in seen:
+            codes.append(sid)
+            seen.add(sid)
+    return tuple(codes)
+
+
+def build_subject_index(config, palette=()):
+    """Everything the dashboard reads from the tree, compiled once per config version.
+
+    Nodes are laid out in preorder, so every subtree is the contiguous slot
+    range [pos, end) and any rollup over it is a difference of prefix sums.
+    Targets roll up that way here: a node with tasks targets the sum of its
+    leaves. Colors map IDs to palette entries by position among siblings.
+    """
+    index = {
+        "parents": tuple(config["subjects"]),
+        "children": {},
+        "tasks": {},
+        "ids": {},
+        "child_ids": {},
+        "paths": {},
+        "order": [],
+        "pos": {},
+        "end": {},
+        "kids": {None: []},
+        "targets": {},
+        "colors": {},
+        "names": subject_name_map(config),
+        "codes": subject_codes(config),
+    }
+    leaf_targets, by_path = [], {(): None}
+    for path, node in iter_nodes(config):
+        node_id, children = node["id"], node.get("children", {})
+        by_path[path] = node_id
+        index["pos"][node_id] = len(index["order"])
+        index["order"].append(node_id)
+        index["paths"][node_id] = path
+        index["kids"][node_id] = []
+        index["kids"][by_path[path[:-1]]].append(node_id)
+        leaf_targets.append(0.0 if children else node.get("target_hours", 1.0))
+        if len(path) == 1:
+            index["ids"][path[0]] = node_id
+            index["children"][path[0]] = tuple(children)
+            index["tasks"][path[0]] = []
+        else:
+            index["child_ids"][(path[0], task_label(path[1:]))] = node_id
+            index["tasks"][path[0]].append(task_label(path[1:]))
+    # Preorder: a node's subtree ends where the next node at its depth or above starts
+    open_nodes = []
+    for slot, node_id in enumerate(index["order"]):
+        depth = len(index["paths"][node_id])
+        while open_nodes and len(index["paths"][open_nodes[-1]]) >= depth:
+            index["end"][open_nodes.pop()] = slot
+        open_nodes.append(node_id)
+    for node_id in open_nodes:
+        index["end"][node_id] = len(index["order"])
+    target_cum = [0.0] + list(accumulate(leaf_targets))
+    for node_id in index["order"]:
+        index["targets"][node_id] = max(0.1, subtree_total(index, target_cum, node_id))
+    for parent_id, kids in index["kids"].items():
+        index["kids"][parent_id] = tuple(kids)
+        if palette:
+            for j, kid in enumerate(kids):
+                index["colors"][kid] = palette[j % len(palette)]
+    index["order"] = tuple(index["order"])
+    index["tasks"] = {parent: tuple(tasks) for parent, tasks in index["tasks"].items()}
+    return index
+
+
+def layout_minutes(index, frame, value_column="duration_minutes"):
+    """Prefix sums of logged minutes over the preorder layout (len(order) + 1 entries).
+
+    Sessions count at the node they were logged against; "General", deleted
+    tasks and other IDs outside the tree count at their top-level subject.
+    """
+    pos = index["pos"]
+    own = [0.0] * len(index["order"])
+    if not frame.empty:
+        grouped = frame.groupby(["parent_subject", "child_subject"], sort=False, observed=True)[value_column].sum()
+        for (parent, child), minutes in grouped.items():
+            slot = pos.get(child, pos.get(parent))
+            if slot is not None:
+                own[slot] += float(minutes)
+    return [0.0] + list(accumulate(own))
+
+
+def subtree_total(index, cum, node_id):
+    """Rollup of a node and everything below it: one range sum over the layout."""
+    return cum[index["end"][node_id]] - cum[index["pos"][node_id]]
+
+
+def node_breakdown(index, cum, node_id):
+    """{ID: subtree minutes} of a node's direct children; time logged on the node itself goes to "General"."""
+    slices = {kid: subtree_total(index, cum, kid) for kid in index["kids"][node_id]}
+    own = subtree_total(index, cum, node_id) - sum(slices.values())
+    if own > 1e-9:
+        slices[GENERAL_TASK] = own
+    return {sid: minutes for sid, minutes in slices.items() if minutes > 0}
+
+
+def subject_ids(config, parent, child):
+    """IDs to write to the log for a (parent, task) selection; the task may be a path label."""
+    parent_data = config["subjects"][parent]
+    path = task_path(child)
+    if parent_data.get("children") and path:
+        try:
+            return parent_data["id"], find_node(config, (parent,) + path)["id"]
+        except KeyError:
+            pass
+    # Parents without tasks log the literal "General" placeholder
+    return parent_data["id"], child
+
+
+def archive_subject(config, node, name):
+    """Remember the names of a deleted node and its whole subtree so old sessions still resolve."""
+    archived = config.setdefault("archived_names", {})
+    archived[node["id"]] = name
+    for path, child_data in iter_nodes({"subjects": node.get("children", {})}):
+        archived[child_data["id"]] = path[-1]
+
+
+def legacy_name_maps(config):
+    """Name -> ID mappings used to migrate a name-based log once (legacy logs are two levels deep)."""
+    parent_map, child_map = {}, {}
+    for parent, parent_data in config["subjects"].items():
+        parent_map[parent] = parent_data["id"]
+        for child, child_data in parent_data.get("children", {}).items():
+            child_map[(parent, child)] = child_data["id"]
+    return parent_map, child_map
+
+
+def subject_totals(frame, value_column="duration_minutes"):
+    """One (parent, child) group-by folded into {parent: {"minutes", "children": {child: minutes}}}."""
+    totals = {}
+    if frame.empty:
+        return totals
+    grouped = frame.groupby(["parent_subject", "child_subject"], sort=False, observed=True)[value_column].sum()
+    for (parent, child), minutes in grouped.items():
+        node = totals.setdefault(parent, {"minutes": 0.0, "children": {}})
+        node["minutes"] += minutes
+        node["children"][child] = minutes
+    return totals
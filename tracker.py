@@ -0,0 +1,204 @@
+"""Session and subject-tree operations shared by the CLI and the HTTP API.
+
+Only json/os/time and the journal are imported at module level, so callers
+that never aggregate (cli.py start/stop/status) stay free of pandas.
+Failures raise TrackerError (bad input) or ConflictError (wrong state).
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import datacache
+from journal import AppendJournal, journal_path
+from profiles import profile_paths, profile_slug
+from scoring import get_focus_score
+from subjects import (
+    GENERAL_TASK, archive_subject, ensure_subject_ids, find_node, iter_nodes, sibling_map, subject_ids, task_label,
+    task_path,
+)
+
+
+class TrackerError(ValueError):
+    pass
+
+
+class ConflictError(TrackerError):
+    pass
+
+
+def data_paths(user):
+    """(data file, config file) of a profile; FOCUS_DATA_FILE picks the backend as in the app."""
+    data_name = os.environ.get("FOCUS_DATA_FILE", "learning_logs.db")
+    return profile_paths(profile_slug(user), data_name, "subjects.json")
+
+
+def load_config(config_file):
+    if not os.path.exists(config_file):
+        raise TrackerError(f"{config_file} not found; open the dashboard once to create it")
+    with open(config_file, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if not config.get("log_subject_ids"):
+        raise TrackerError("subject IDs are not migrated yet; open the dashboard once first")
+    return config
+
+
+def save_config(config_file, config):
+    ensure_subject_ids(config)
+    tmp = config_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, config_file)
+    datacache.touch(config_file)
+
+
+def resolve_subject(config, parent, child):
+    """Validate a (parent, task) selection; the task may be a nested path such as "Algorithms/Graphs".
+
+    Parents without tasks log "General".
+    """
+    if parent not in config["subjects"]:
+        raise TrackerError(f"unknown subject {parent!r}; known: {', '.join(config['subjects'])}")
+    if not config["subjects"][parent].get("children"):
+        return parent, GENERAL_TASK
+    path = task_path(child)
+    try:
+        if not path:
+            raise KeyError(child)
+        find_node(config, (parent,) + path)
+    except KeyError:
+        tasks = [task_label(p[1:]) for p, _ in iter_nodes({"subjects": {parent: config["subjects"][parent]}}) if len(p) > 1]
+        raise TrackerError(f"pick a task of {parent!r}: {', '.join(tasks)}") from None
+    return parent, task_label(path)
+
+
+# ---------- sessions ----------
+
+def _active_path(data_file):
+    return data_file + ".active"
+
+
+def read_active(data_file):
+    """The running session {"parent", "child", "parent_id", "child_id", "start"} or None.
+
+    The names are for display only; the IDs are what gets logged, so renaming
+    the subject while the session runs does not break stop.
+    """
+    path = _active_path(data_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def session_record(config, parent, child, minutes, ended_at):
+    return _id_record(*subject_ids(config, parent, child), minutes, ended_at)
+
+
+def _id_record(parent_id, child_id, minutes, ended_at):
+    return {
+        "timestamp": ended_at,
+        "parent_subject": parent_id,
+        "child_subject": child_id,
+        "duration_minutes": minutes,
+        "focus_score": get_focus_score(minutes),
+    }
+
+
+def _append(data_file, record, store):
+    # 无 store 时只追加日志, 看板下次重跑时合并; 有 store 时立即合并
+    journal = AppendJournal(journal_path(data_file), store)
+    journal.append(record)
+    if store is not None:
+        journal.compact()
+        datacache.touch(data_file)
+
+
+def start_session(data_file, config_file, parent, child=None):
+    config = load_config(config_file)
+    parent, child = resolve_subject(config, parent, child)
+    if read_active(data_file):
+        raise ConflictError("a session is already running; stop it first")
+    parent_id, child_id = subject_ids(config, parent, child)
+    active = {"parent": parent, "child": child, "parent_id": parent_id, "child_id": child_id, "start": time.time()}
+    tmp = _active_path(data_file) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(active, f, ensure_ascii=False)
+    os.replace(tmp, _active_path(data_file))
+    return active
+
+
+def stop_session(data_file, config_file, store=None):
+    """Log the running session; returns the journaled record."""
+    active = read_active(data_file)
+    if active is None:
+        raise ConflictError("no session is running")
+    minutes = round((time.time() - active["start"]) / 60, 2)
+    if "parent_id" in active:
+        record = _id_record(active["parent_id"], active["child_id"], minutes, datetime.now())
+    else:
+        # Started before .active kept IDs: only the names are known
+        try:
+            record = session_record(load_config(config_file), active["parent"], active["child"], minutes, datetime.now())
+        except KeyError:
+            raise TrackerError(f"{active['parent']} / {active['child']} was renamed or deleted since the session "
+                               f"started; log it by hand and remove {_active_path(data_file)}") from None
+    _append(data_file, record, store)
+    os.remove(_active_path(data_file))
+    return record
+
+
+def log_session(data_file, config_file, parent, child, minutes, ended_at=None, store=None):
+    """Log a finished session that was not timed here."""
+    if minutes <= 0:
+        raise TrackerError("minutes must be positive")
+    config = load_config(config_file)
+    parent, child = resolve_subject(config, parent, child)
+    record = session_record(config, parent, child, round(minutes, 2), ended_at or datetime.now())
+    _append(data_file, record, store)
+    return record
+
+
+# ---------- subject tree ----------
+
+def _node_path(config, parent, child=None):
+    """(parent, task, ...) of an existing node; child may be a nested task path."""
+    path = (parent,) + task_path(child)
+    if parent not in config["subjects"]:
+        raise TrackerError(f"unknown subject {parent!r}")
+    try:
+        find_node(config, path)
+    except KeyError:
+        raise TrackerError(f"unknown task {task_label(path[1:])!r} of {parent!r}") from None
+    return path
+
+
+def add_subject(config, name, target_hours, parent=None):
+    """Add a top-level subject, or a task under parent ("Subject" or "Subject/Task/...")."""
+    if parent is None:
+        siblings = config["subjects"]
+    else:
+        path = task_path(parent)
+        siblings = find_node(config, _node_path(config, path[0], path[1:])).setdefault("children", {})
+    if not name or name in siblings:
+        raise ConflictError(f"{name!r} already exists" if name else "name is required")
+    siblings[name] = {"target_hours": float(target_hours)}
+    if parent is None:
+        siblings[name]["children"] = {}
+
+
+def update_subject(config, parent, child=None, name=None, target_hours=None):
+    """Rename and/or retarget a node; the log keys on IDs, so a rename is config-only."""
+    path = _node_path(config, parent, child)
+    node, siblings, old = find_node(config, path), sibling_map(config, path), path[-1]
+    if target_hours is not None:
+        node["target_hours"] = float(target_hours)
+    if name and name != old:
+        if name in siblings:
+            raise ConflictError(f"{name!r} already exists")
+        siblings[name] = siblings.pop(old)
+
+
+def delete_subject(config, parent, child=None):
+    path = _node_path(config, parent, child)
+    archive_subject(config, sibling_map(config, path).pop(path[-1]), path[-1])